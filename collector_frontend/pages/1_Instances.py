@@ -2,7 +2,7 @@ import streamlit as st
 import pandas as pd
 from db import get_db
 from bson import ObjectId
-from datetime import datetime
+from datetime import datetime, timedelta
 from utils import status_badge, export_to_json, confirm_action, safe_get
 from utils_css import apply_light_theme
 
@@ -39,6 +39,34 @@ def get_instances():
     
     return list(instances_col.find(query))
 
+# Espelho de JobQueue.JOBS (collector_worker/services/job_queue.py)
+QUEUE_JOBS = ["clients", "bills", "dialer", "reports", "metrics", "client_types", "blocked_contracts"]
+
+# Heartbeats mais antigos que isso (JobConsumer.HEARTBEAT_SECONDS = 30) indicam consumer parado
+CONSUMER_STALE_SECONDS = 120
+
+def active_consumers():
+    """Consumers da fila com heartbeat recente em job_consumers."""
+    cutoff = datetime.now() - timedelta(seconds=CONSUMER_STALE_SECONDS)
+    return db.job_consumers.count_documents({"heartbeat_at": {"$gte": cutoff}})
+
+def request_job(job, inst):
+    """
+    Pede ao worker para enfileirar um job (job_requests). Retorna False se já houver um pendente.
+
+    O documento da fila é montado só pelo worker (JobQueue.accept_requests),
+    que resolve o instance_full_id a partir do _id da instância.
+    """
+    pending = db.job_requests.find_one({"job": job, "instance_id": inst["_id"]}, {"_id": 1})
+    if pending is None:
+        pending = db.job_queue.find_one(
+            {"job": job, "instance_full_id": {"$regex": f"-{inst['_id']}$"}, "slot": "pending"}, {"_id": 1}
+        )
+    if pending is not None:
+        return False
+    db.job_requests.insert_one({"job": job, "instance_id": inst["_id"], "requested_at": datetime.now()})
+    return True
+
 # --- Layout da UI ---
 tab1, tab2, tab3 = st.tabs(["📋 Listar Instâncias", "➕ Adicionar Nova", "📥 Exportar/Importar"])
 
@@ -227,6 +255,22 @@ with tab1:
                             width="stretch"
                         )
 
+                # Execução sob demanda: apenas enfileira, o worker (consumer) executa
+                st.divider()
+                st.markdown("#### ▶️ Executar Agora")
+                q_col1, q_col2 = st.columns([3, 1])
+                with q_col1:
+                    queue_job = st.selectbox("Rotina", QUEUE_JOBS, key=f"queue_job_{inst['_id']}", label_visibility="collapsed")
+                consumers = active_consumers()
+                with q_col2:
+                    if st.button("▶️ Enfileirar", key=f"queue_btn_{inst['_id']}", width="stretch", disabled=not consumers):
+                        if request_job(queue_job, inst):
+                            st.success(f"✅ '{queue_job}' enfileirado para {inst_name}")
+                        else:
+                            st.info(f"ℹ️ '{queue_job}' já está na fila para {inst_name}")
+                if not consumers:
+                    st.warning("⚠️ Nenhum consumer da fila ativo: habilite JOB_QUEUE_ENABLED com JOB_QUEUE_WORKERS > 0 ou rode `python main.py --job consumer`.")
+
                 # Zona de Perigo fora das abas mas dentro do expander
                 st.divider()
                 with st.expander("🗑️ Zona de Perigo"):
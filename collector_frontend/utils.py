@@ -1,6 +1,6 @@
 """Shared utility functions for the Streamlit frontend."""
 import streamlit as st
-from datetime import datetime
+from datetime import datetime, timedelta
 import json
 from pymongo import MongoClient
 
@@ -58,3 +58,37 @@ def confirm_action(message, key=None):
     if key:
         return st.checkbox(f"⚠️ {message}", key=key)
     return st.checkbox(f"⚠️ {message}")
+
+# Cópia de EVENT_TYPES de collector_worker/utils/event_codec.py (mesma ordem)
+EVENT_TYPES = [
+    "CHAN_START", "CHAN_END", "ANSWER", "HANGUP", "APP_START", "APP_END",
+    "BRIDGE_ENTER", "BRIDGE_EXIT", "LINKEDID_END", "PARK_START", "PARK_END",
+    "BLINDTRANSFER", "ATTENDEDTRANSFER", "PICKUP", "FORWARD", "LOCAL_OPTIMIZE",
+    "USER_DEFINED", "BRIDGE_START", "BRIDGE_END", "BRIDGE_UPDATE", "TRANSFER", "3WAY_START", "3WAY_END"
+]
+EVENT_TEXT_FIELDS = ["cid_name", "cid_num", "cid_dnid", "exten", "appname", "uniqueid"]
+
+def decode_events(doc):
+    """Converte os eventos compactos de um CDR (last_reports.events) em lista de linhas; listas antigas passam direto."""
+    if not doc:
+        return []
+    if isinstance(doc, list):
+        return doc
+
+    n = doc["n"]
+
+    def column(value):
+        return value if isinstance(value, list) else [value] * n
+
+    if "t0" in doc:
+        start = datetime(1970, 1, 1) + timedelta(seconds=doc["t0"])
+        times = [(start + timedelta(seconds=dt)).isoformat(" ") for dt in column(doc["dt"])]
+    else:
+        times = column(doc.get("eventtime"))
+    types = [EVENT_TYPES[t] if isinstance(t, int) and 0 <= t < len(EVENT_TYPES) else t for t in column(doc.get("type"))]
+    columns = {field: column(doc.get(field)) for field in EVENT_TEXT_FIELDS}
+
+    return [
+        {"eventtime": times[i], "eventtype": types[i], **{field: columns[field][i] for field in EVENT_TEXT_FIELDS}}
+        for i in range(n)
+    ]
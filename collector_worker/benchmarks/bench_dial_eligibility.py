@@ -0,0 +1,108 @@
+"""
+Dial-eligibility benchmark: per-number queries on history_action_log (legacy)
+vs one indexed lookup on dial_state.
+
+Seeds N debtors (expired bills + dialer history) into a scratch database
+named '<DB_NAME>_bench', times Dialer.build_queue with both strategies and
+drops the scratch database afterwards.
+
+Usage (from collector_worker/):
+    python benchmarks/bench_dial_eligibility.py --debtors 5000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.environ["DB_NAME"] = os.getenv("DB_NAME", "debt_collector") + "_bench"
+
+from bson import ObjectId
+from loguru import logger
+from database import Database
+from services.dialer import Dialer
+
+def seed(db, instance_full_id, debtors):
+    now = datetime.now()
+    bills, history = [], []
+    for cid in range(1, debtors + 1):
+        phone = f"8299{cid:07d}"
+        bills.append({
+            "instance_full_id": instance_full_id,
+            "full_id": f"bench-ixc-{cid}-{cid}",
+            "id_cliente": cid,
+            "vencimento_status": "expired",
+            "expired_age": random.randint(1, 30),
+            "valor": round(random.uniform(50, 300), 2),
+            "razao": f"Client {cid}",
+            "telefone_celular": phone,
+            "whatsapp": phone,
+        })
+        # Roughly a third of the debtors were already called in the last days
+        for _ in range(random.choice([0, 0, 1, 3])):
+            history.append({
+                "instance_full_id": instance_full_id,
+                "full_id": f"bench-ixc-{cid}-{cid}",
+                "action": "dialer_trigger",
+                "occurred_at": now - timedelta(hours=random.randint(1, 72)),
+                "details": {"number": phone, "status": "success"}
+            })
+    db.bills.insert_many(bills)
+    if history:
+        db.history_action_log.insert_many(history)
+    return bills
+
+def legacy_can_call_number(dialer, number):
+    """Pre-batching implementation: count_documents + sorted find_one per number."""
+    today_start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    base = {"instance_full_id": dialer.instance_full_id, "action": "dialer_trigger", "details.number": number}
+    if dialer.db.history_action_log.count_documents({**base, "occurred_at": {"$gte": today_start}}) >= dialer.dial_per_day:
+        return False
+    last = dialer.db.history_action_log.find_one(base, sort=[("occurred_at", -1)])
+    return not (last and datetime.now() - last["occurred_at"] < timedelta(hours=dialer.dial_interval))
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--debtors", type=int, default=5000)
+    args = parser.parse_args()
+
+    logger.remove()
+    database = Database()
+    db = database.get_db()
+    database.ensure_indices()
+
+    instance = {
+        "_id": ObjectId(), "instance_name": "bench", "erp": {"type": "ixc"},
+        "charger": {"minimum_days_to_charge": 0, "dial_per_day": 3, "dial_interval": 4},
+        "asterisk": {"num_channel_available": 10}, "debug_calls": True
+    }
+    dialer = Dialer(instance)
+
+    try:
+        bills = seed(db, dialer.instance_full_id, args.debtors)
+
+        # One-time migration of the seeded history, as the first dialer run would do
+        backfill_time, _ = timed(dialer.dial_state.backfill_from_history)
+        batched_time, (batched_queue, _) = timed(lambda: dialer.build_queue(bills))
+
+        dialer.can_call_number = lambda number, history=None: legacy_can_call_number(dialer, number)
+        dialer.load_dial_history = lambda numbers: {}
+        legacy_time, (legacy_queue, _) = timed(lambda: dialer.build_queue(bills))
+
+        print(f"Debtors:            {args.debtors}")
+        print(f"Legacy per-number:  {legacy_time:.3f}s")
+        print(f"dial_state lookup:  {batched_time:.3f}s (one-time backfill {backfill_time:.3f}s)")
+        print(f"Speedup:            {legacy_time / batched_time:.1f}x")
+        print(f"Same queue size:    {len(legacy_queue) == len(batched_queue)}")
+    finally:
+        database.client.drop_database(db.name)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""
+Dialer load simulation: queue building and origination against a fake ARI.
+
+Seeds N debtors (expired bills with dial_numbers, partial dial_state) into a
+scratch database named '<DB_NAME>_bench', then measures:
+
+- queue build time and Mongo round trips for build_queue (bills in memory),
+  build_queue_from_db (aggregation) and build_queue_from_index (priority index)
+- origination of the queue against services/fake_ari.py with the given
+  latency and failure rate: calls/sec, p50/p95 origination latency and Mongo
+  round trips of the trigger loop (including the bulk outcome flush)
+
+The scratch database is dropped afterwards.
+
+Usage (from collector_worker/):
+    python main.py --job dialer-bench --debtors 5000 --ari-latency 0.05 --ari-failure-rate 0.02
+    python benchmarks/bench_dialer.py --debtors 5000
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from bson import ObjectId
+from loguru import logger
+from pymongo import monitoring
+from config import Config
+
+class CommandCounter(monitoring.CommandListener):
+    """Counts commands sent to MongoDB (one per round trip)."""
+
+    def __init__(self):
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def started(self, event):
+        with self._lock:
+            self.count += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+def seed(db, instance_full_id, debtors):
+    from utils.phone_utils import build_dial_numbers
+
+    now = datetime.now()
+    bills, state = [], []
+    for cid in range(1, debtors + 1):
+        phone = f"8299{cid:07d}"
+        bill = {
+            "instance_full_id": instance_full_id,
+            "full_id": f"bench-ixc-{cid}-{cid}",
+            "id_cliente": cid,
+            "vencimento_status": "expired",
+            "expired_age": random.randint(1, 60),
+            "valor": round(random.uniform(50, 300), 2),
+            "razao": f"Client {cid}",
+            "telefone_celular": phone,
+            "whatsapp": phone,
+        }
+        bill["dial_numbers"] = build_dial_numbers(bill)
+        bills.append(bill)
+
+        # Roughly a third of the debtors were already called in the last days
+        attempts = random.choice([0, 0, 1, 3])
+        if attempts:
+            last = now - timedelta(hours=random.randint(1, 72))
+            state.append({
+                "instance_full_id": instance_full_id,
+                "number": phone,
+                "day": last.strftime("%Y-%m-%d"),
+                "count_today": attempts,
+                "last_attempt_at": last,
+                "attempts_total": attempts,
+                "answered_total": random.randint(0, attempts)
+            })
+    db.bills.insert_many(bills)
+    if state:
+        db.dial_state.insert_many(state)
+    return bills
+
+def measure(counter, fn):
+    start_count = counter.count
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, counter.count - start_count, result
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(round(pct / 100 * (len(ordered) - 1))), len(ordered) - 1)]
+
+def run(debtors=2000, latency=0.05, failure_rate=0.0, channels=30, calls=None):
+    """Runs the simulation; must be called before anything connects to MongoDB (round trips are counted per client)."""
+    counter = CommandCounter()
+    monitoring.register(counter)
+    Config.DB_NAME = f"{Config.DB_NAME}_bench"
+
+    from database import Database
+    from services.dialer import Dialer
+    from services.fake_ari import FakeAri
+
+    database = Database()
+    db = database.get_db()
+    # A Database() created before DB_NAME was changed would point at the real data
+    if not db.name.endswith("_bench"):
+        raise RuntimeError(f"Connected to '{db.name}', not a scratch '_bench' database; refusing to seed or drop it")
+    database.ensure_indices()
+
+    fake = FakeAri(call_seconds=(1, 3), ring_seconds=(0.1, 0.5), latency=latency, failure_rate=failure_rate).start()
+    instance = {
+        "_id": ObjectId(), "instance_name": "bench", "erp": {"type": "ixc"},
+        "charger": {"minimum_days_to_charge": 0, "dial_per_day": 3, "dial_interval": 4},
+        "asterisk": {"num_channel_available": channels, "channel_type": "SIP", "channel": "bench-trunk", **fake.pabx_overrides},
+        "debug_calls": True
+    }
+    dialer = Dialer(instance)
+    calls = calls or debtors
+
+    try:
+        bills = seed(db, dialer.instance_full_id, debtors)
+
+        refresh_time, refresh_trips, _ = measure(counter, dialer.priority.refresh)
+        builds = {
+            "build_queue (bills in memory)": lambda: dialer.build_queue(bills, limit=calls),
+            "build_queue_from_db": lambda: dialer.build_queue_from_db(limit=calls),
+            "build_queue_from_index": lambda: dialer.build_queue_from_index(limit=calls)
+        }
+        results = {name: measure(counter, fn) for name, fn in builds.items()}
+        queue = results["build_queue_from_index"][2][0]
+
+        def trigger_loop():
+            outcomes = dialer.originate_queue(queue)
+            for r in outcomes:
+                if r['ok']:
+                    dialer.record_trigger(r['call'])
+            dialer.flush_outcomes()
+            return outcomes
+
+        loop_time, loop_trips, outcomes = measure(counter, trigger_loop)
+        ok = [r for r in outcomes if r['ok']]
+        latencies = [r['elapsed'] for r in outcomes if r['status'] != 'skipped']
+
+        print(f"Debtors:              {debtors}")
+        print(f"Fake ARI:             latency {latency}s, failure rate {failure_rate:.0%}, {channels} channels")
+        print(f"Priority refresh:     {refresh_time:.3f}s, {refresh_trips} round trips")
+        for name, (elapsed, trips, (q, _)) in results.items():
+            print(f"{name + ':':<30}{elapsed:.3f}s, {trips} round trips, {len(q)} calls")
+        print(f"Trigger loop:         {len(queue)} calls in {loop_time:.3f}s, {loop_trips} round trips")
+        print(f"Originated:           {len(ok)} ok, {len(outcomes) - len(ok)} failed")
+        print(f"Throughput:           {len(ok) / loop_time if loop_time else 0:.1f} calls/s")
+        print(f"Origination latency:  p50 {percentile(latencies, 50):.3f}s, p95 {percentile(latencies, 95):.3f}s")
+    finally:
+        fake.stop()
+        database.client.drop_database(db.name)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--debtors", type=int, default=2000)
+    parser.add_argument("--calls", type=int, default=None, help="Calls to originate (default: one per debtor)")
+    parser.add_argument("--channels", type=int, default=30)
+    parser.add_argument("--ari-latency", type=float, default=0.05)
+    parser.add_argument("--ari-failure-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    logger.remove()
+    run(args.debtors, args.ari_latency, args.ari_failure_rate, args.channels, args.calls)
+
+if __name__ == "__main__":
+    main()
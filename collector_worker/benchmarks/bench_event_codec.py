@@ -0,0 +1,108 @@
+"""
+Event storage benchmark: one dict per event row (legacy) vs the columnar
+encoding of utils/event_codec.py.
+
+Generates a day of dialer traffic (N calls with 6-20 CEL events each, the
+shape of the Issabel raw-mode page) and reports:
+
+- stored size of the `events` field: BSON when pymongo's bson is installed,
+  otherwise compact JSON
+- working-set memory of holding every call's events (tracemalloc)
+- encode / decode time
+
+Decoding must give back the original rows. Needs no database.
+
+Usage (from collector_worker/):
+    python benchmarks/bench_event_codec.py --calls 20000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from utils.event_codec import EVENT_TYPES, decode_events, encode_events
+
+try:
+    import bson
+except ImportError:
+    bson = None
+
+def build_day(calls):
+    start = datetime.now().replace(hour=8, minute=0, second=0, microsecond=0)
+    day = []
+    for i in range(calls):
+        at = start + timedelta(seconds=i * 2)
+        uniqueid = f"{int(at.timestamp())}.{i}"
+        number = f"5582999{i:06d}"
+        events = []
+        for j in range(random.randint(6, 20)):
+            at += timedelta(seconds=random.choice([0, 0, 1, 2, 5]))
+            events.append({
+                "eventtime": at.strftime("%Y-%m-%d %H:%M:%S"),
+                "eventtype": random.choice(EVENT_TYPES[:9]),
+                "cid_name": f"ixc-{i % 97}-{i}",
+                "cid_num": f"ixc-{i % 97}-{i}",
+                "cid_dnid": None,
+                "exten": "s" if j else number,
+                "appname": random.choice(["Dial", "AppDial", "Playback", "AMD", None]),
+                "uniqueid": uniqueid
+            })
+        day.append(events)
+    return day
+
+def stored_size(value):
+    if bson:
+        return len(bson.encode({"events": value}))
+    return len(json.dumps({"events": value}, separators=(",", ":")))
+
+def held_memory(build):
+    tracemalloc.start()
+    data = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del data
+    return current
+
+def run(calls=20000):
+    random.seed(7)
+    day = build_day(calls)
+    rows = sum(len(events) for events in day)
+
+    start = time.perf_counter()
+    encoded = [encode_events(events) for events in day]
+    encode_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    decoded = [decode_events(doc) for doc in encoded]
+    decode_time = time.perf_counter() - start
+    assert decoded == day, "decoded events differ from the original rows"
+
+    legacy_size = sum(stored_size(events) for events in day)
+    compact_size = sum(stored_size(doc) for doc in encoded)
+
+    # Memory of loading the stored documents: deep copies rebuilt from JSON
+    legacy_json = [json.dumps(events) for events in day]
+    compact_json = [json.dumps(doc) for doc in encoded]
+    legacy_mem = held_memory(lambda: [json.loads(s) for s in legacy_json])
+    compact_mem = held_memory(lambda: [json.loads(s) for s in compact_json])
+
+    print(f"Calls / events:       {calls} / {rows}")
+    print(f"Stored size ({'BSON' if bson else 'JSON'}):   legacy {legacy_size / 1048576:.1f} MiB, compact {compact_size / 1048576:.1f} MiB "
+          f"({1 - compact_size / legacy_size:.0%} smaller, {legacy_size / calls:.0f} -> {compact_size / calls:.0f} B/call)")
+    print(f"Working set:          legacy {legacy_mem / 1048576:.1f} MiB, compact {compact_mem / 1048576:.1f} MiB ({1 - compact_mem / legacy_mem:.0%} smaller)")
+    print(f"Encode / decode:      {encode_time * 1000:.0f} ms / {decode_time * 1000:.0f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=20000)
+    args = parser.parse_args()
+    run(args.calls)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+HTML cell cleaning benchmark: legacy per-cell `re.sub` + `html.unescape`
+vs utils/html_cells.py (precompiled patterns, plain-text fast path).
+
+Builds an Issabel CDR report page with N rows in the `var cdrs` array (or
+reads a recorded one with --page) and a raw-mode events page, then times:
+
+- cleaning every CDR row (legacy clean_html per cell vs clean_row)
+- parsing the events table (uncompiled regexes vs parse_table)
+
+Both paths must produce the same output. Needs no database.
+
+Usage (from collector_worker/):
+    python benchmarks/bench_html_cells.py --rows 10000
+    python benchmarks/bench_html_cells.py --page recorded_cdr_page.html
+"""
+import argparse
+import html
+import json
+import os
+import random
+import re
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from utils.cdr_stream import CdrStreamParser
+from utils.html_cells import clean_row, parse_table
+
+CDR_WIDTH = 11
+
+def legacy_clean_html(text):
+    if not text:
+        return None
+    text = str(text)
+    text = re.sub(r'<[^>]+>', '', text)
+    text = html.unescape(text)
+    text = text.strip()
+    if text in ("", "&nbsp;"):
+        return None
+    return text
+
+def legacy_parse_table(page):
+    table_match = re.search(r'<table[^>]*class="issabel-standard-table"[^>]*>(.*?)</table>', page, re.S)
+    if not table_match:
+        return []
+    rows = re.findall(r'<tr[^>]*>(.*?)</tr>', table_match.group(1), re.S)
+    parsed = []
+    for row in rows[1:]:
+        cells = [legacy_clean_html(c) for c in re.findall(r'<td[^>]*>(.*?)</td>', row, re.S)]
+        if any(cells):
+            parsed.append(cells)
+    return parsed
+
+def build_cdr_page(rows):
+    """CDR report page shaped like Issabel's: mostly plain values, some links, entities and `&nbsp;` cells."""
+    start = datetime.now() - timedelta(days=1)
+    cdrs = []
+    for i in range(rows):
+        calldate = (start + timedelta(seconds=i * 7)).strftime("%Y-%m-%d %H:%M:%S")
+        uniqueid = f"{1700000000 + i}.{i}"
+        disposition = random.choice(["ANSWERED", "NO ANSWER", "BUSY", "FAILED"])
+        cdrs.append([
+            calldate,
+            f"ixc-{i % 97}-{i}" if i % 3 else "&nbsp;",
+            f"5582999{i:06d}",
+            "cobranca-auto",
+            f"SIP/trunk-{i:08x}",
+            f"<span title=\"dst\">SIP/trunk-{i + 1:08x}</span>" if i % 5 == 0 else "",
+            "Dial",
+            disposition,
+            str(random.randint(0, 300)),
+            f"<a href=\"index.php?menu=cdrreport&amp;uniqueid={uniqueid}\">{uniqueid}</a>" if i % 4 == 0 else uniqueid,
+            "AMD_MACHINE" if i % 11 == 0 else "Cobran&ccedil;a",
+        ])
+    return f"<html><body><script>\nvar cdrs = {json.dumps(cdrs)};\n</script></body></html>"
+
+def build_events_page(rows):
+    header = "<tr>" + "".join(f"<th>{h}</th>" for h in ("Time", "Type", "Name", "Num", "DNID", "Exten", "App", "Uniqueid")) + "</tr>"
+    body = "".join(
+        f"<tr class=\"row\"><td>2024-01-01 10:00:{i % 60:02d}</td><td>CHAN_START</td><td>Cobran&ccedil;a</td>"
+        f"<td>5582999{i:06d}</td><td>&nbsp;</td><td><b>s</b></td><td>Dial</td><td>1700000000.{i}</td></tr>"
+        for i in range(rows)
+    )
+    return f"<html><table class=\"issabel-standard-table\" width=\"100%\">{header}{body}</table></html>"
+
+def best_of(repeat, fn):
+    times, result = [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+def run(rows=10000, repeat=5, page=None, event_rows=40):
+    if page:
+        with open(page, encoding="utf-8", errors="replace") as f:
+            cdr_page = f.read()
+    else:
+        cdr_page = build_cdr_page(rows)
+
+    parser = CdrStreamParser()
+    raw_rows = parser.feed(cdr_page)
+    parser.close()
+    if not raw_rows:
+        print("No `var cdrs` rows found on the page")
+        return
+
+    def legacy_rows():
+        return [[legacy_clean_html(r[i]) if i < len(r) else None for i in range(CDR_WIDTH)] for r in raw_rows]
+
+    def fast_rows():
+        return [clean_row(r[:CDR_WIDTH], CDR_WIDTH) for r in raw_rows]
+
+    events_page = build_events_page(event_rows)
+    pages = len(raw_rows)
+
+    legacy_time, legacy_result = best_of(repeat, legacy_rows)
+    fast_time, fast_result = best_of(repeat, fast_rows)
+    assert legacy_result == fast_result, "clean_row output differs from legacy clean_html"
+
+    legacy_ev_time, legacy_ev = best_of(repeat, lambda: [legacy_parse_table(events_page) for _ in range(pages // 100 or 1)])
+    fast_ev_time, fast_ev = best_of(repeat, lambda: [parse_table(events_page, "issabel-standard-table") for _ in range(pages // 100 or 1)])
+    assert legacy_ev == fast_ev, "parse_table output differs from legacy regexes"
+
+    print(f"CDR page:             {len(raw_rows)} rows, {len(cdr_page) / 1024:.0f} KiB{' (' + page + ')' if page else ''}")
+    print(f"Row cleaning legacy:  {legacy_time * 1000:.1f} ms")
+    print(f"Row cleaning fast:    {fast_time * 1000:.1f} ms ({legacy_time / fast_time:.1f}x)")
+    print(f"Events pages:         {pages // 100 or 1} x {event_rows} rows")
+    print(f"Events parse legacy:  {legacy_ev_time * 1000:.1f} ms")
+    print(f"Events parse fast:    {fast_ev_time * 1000:.1f} ms ({legacy_ev_time / fast_ev_time:.1f}x)")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--page", default=None, help="Recorded CDR report page (HTML) to use instead of a generated one")
+    args = parser.parse_args()
+    run(args.rows, args.repeat, args.page)
+
+if __name__ == "__main__":
+    main()
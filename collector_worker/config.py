@@ -7,3 +7,51 @@ class Config:
     MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
     DB_NAME = os.getenv("DB_NAME", "debt_collector")
     DEBUG = os.getenv("DEBUG", "false").lower() == "true"
+
+    # Deferred report fetch after each instance's dialer run
+    REPORT_DELAY_MINUTES = int(os.getenv("REPORT_DELAY_MINUTES", "5"))
+    DELAYED_TASKS_PERSIST = os.getenv("DELAYED_TASKS_PERSIST", "true").lower() == "true"
+
+    # Mongo work queue: scheduler enqueues, consumers execute
+    JOB_QUEUE_ENABLED = os.getenv("JOB_QUEUE_ENABLED", "false").lower() == "true"
+    JOB_QUEUE_WORKERS = int(os.getenv("JOB_QUEUE_WORKERS", "2"))
+    JOB_QUEUE_LEASE_SECONDS = int(os.getenv("JOB_QUEUE_LEASE_SECONDS", "1800"))
+
+    # Active instance cache; polling is the fallback when change streams are unavailable
+    INSTANCE_REGISTRY_POLL_SECONDS = int(os.getenv("INSTANCE_REGISTRY_POLL_SECONDS", "30"))
+
+    # Ceiling of concurrent requests per remote host (ERP, ARI, CDR); overrides as "host:port=n,..."
+    OUTBOUND_MAX_PER_HOST = int(os.getenv("OUTBOUND_MAX_PER_HOST", "4"))
+    OUTBOUND_HOST_LIMITS = os.getenv("OUTBOUND_HOST_LIMITS", "")
+
+    # Graceful shutdown / resumable jobs
+    SHUTDOWN_GRACE_SECONDS = int(os.getenv("SHUTDOWN_GRACE_SECONDS", "50"))
+    CHECKPOINT_MAX_AGE_MINUTES = int(os.getenv("CHECKPOINT_MAX_AGE_MINUTES", "120"))
+    BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "1000"))
+
+    # Continuous (ARI event driven) dialer: candidate refill throttle and Stasis app name
+    CONTINUOUS_DIALER_REFILL_SECONDS = int(os.getenv("CONTINUOUS_DIALER_REFILL_SECONDS", "60"))
+    ARI_APP = os.getenv("ARI_APP", "debt-collector")
+
+    # Dialer outcome writes are buffered and flushed in bulk every N triggered calls (and at the end of a run)
+    DIALER_FLUSH_EVERY = int(os.getenv("DIALER_FLUSH_EVERY", "50"))
+
+    # Incremental CDR ingestion: re-read this much before the last ingested calldate (late records)
+    CDR_OVERLAP_MINUTES = int(os.getenv("CDR_OVERLAP_MINUTES", "10"))
+    CDR_MAX_LOOKBACK_DAYS = int(os.getenv("CDR_MAX_LOOKBACK_DAYS", "1"))
+
+    # CDR event enrichment (raw-mode page per call); per instance: asterisk.fetch_events / asterisk.events_workers
+    CDR_EVENTS_ENABLED = os.getenv("CDR_EVENTS_ENABLED", "false").lower() == "true"
+    CDR_EVENTS_WORKERS = int(os.getenv("CDR_EVENTS_WORKERS", "4"))
+    # Store events in the columnar form of utils/event_codec.py instead of one dict per row
+    CDR_EVENTS_COMPACT = os.getenv("CDR_EVENTS_COMPACT", "true").lower() == "true"
+
+    # Download the CDR report once per Issabel host/user and route rows to instances by channel pattern
+    CDR_SHARED_FETCH = os.getenv("CDR_SHARED_FETCH", "true").lower() == "true"
+
+    # Default file for asterisk.cdr_source == "csv" (per instance: asterisk.cdr_csv_path)
+    CDR_CSV_PATH = os.getenv("CDR_CSV_PATH", "/var/log/asterisk/cdr-csv/Master.csv")
+
+    # Issabel session reuse: cookie lifetime per CDR host (slides on use) and optional copy in 'pbx_sessions'
+    PBX_SESSION_TTL_MINUTES = int(os.getenv("PBX_SESSION_TTL_MINUTES", "20"))
+    PBX_SESSION_PERSIST = os.getenv("PBX_SESSION_PERSIST", "true").lower() == "true"
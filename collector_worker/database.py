@@ -34,7 +34,7 @@ class Database:
 
     def ensure_collections(self):
         """Ensures all required collections exist."""
-        required = ["clients", "bills", "history_action_log", "last_reports", "data_reference", "instance_config", "metrics", "client_types"]
+        required = ["clients", "bills", "history_action_log", "last_reports", "data_reference", "instance_config", "metrics", "client_types", "delayed_tasks", "job_queue", "job_requests", "job_consumers", "job_checkpoints", "job_checkpoint_pages", "dial_state", "dialer_priority", "pbx_sessions"]
         existing = self.get_collections()
         created = []
         
@@ -54,13 +54,19 @@ class Database:
         try:
             # Clients
             self.db.clients.create_index([("instance_full_id", 1), ("id", 1)], unique=True)
+            self.db.clients.create_index([("instance_full_id", 1), ("dial_numbers.number", 1)])
+            self.db.clients.create_index("dial_numbers.e164")
             
             # Client Types
             self.db.client_types.create_index([("instance_full_id", 1), ("id", 1)], unique=True)
             
             # Bills
             self.db.bills.create_index("full_id", unique=True)
-            self.db.bills.create_index([("instance_full_id", 1), ("vencimento_status", 1)])
+            self.db.bills.create_index([("instance_full_id", 1), ("dial_numbers.number", 1)])
+            self.db.bills.create_index([("instance_full_id", 1), ("call_history.uniqueid", 1)])
+            
+            # Dialer candidate selection (candidate_pipeline); its prefix serves instance/status lookups
+            self.db.bills.create_index([("instance_full_id", 1), ("vencimento_status", 1), ("expired_age", 1)])
             
             # History Action Log
             self.db.history_action_log.create_index("full_id")
@@ -75,9 +81,35 @@ class Database:
                 ("occurred_at", -1)
             ])
 
+            # Dial State (per-number eligibility, one indexed lookup per run)
+            self.db.dial_state.create_index([("instance_full_id", 1), ("number", 1)], unique=True)
+
+            # Dialer Priority (ranked debtors, refreshed by the bills sync)
+            self.db.dialer_priority.create_index([("instance_full_id", 1), ("client_id", 1)], unique=True)
+            self.db.dialer_priority.create_index([("instance_full_id", 1), ("score", -1)])
+
+            # Last Reports: lookups by CDR uniqueid (dialer trigger doc + CDR merge)
+            self.db.last_reports.create_index("uniqueid")
+            # Pacing: dialer-originated outcomes per instance over the rolling window
+            self.db.last_reports.create_index([("instance_full_id", 1), ("triggered_at", -1)])
+
             # Metrics
             self.db.metrics.create_index([("instance_full_id", 1), ("timestamp", -1)])
 
+            # Delayed Tasks (one-shot deferred jobs, e.g. post-dialer reports)
+            self.db.delayed_tasks.create_index("run_at")
+
+            # Job Queue: at most one pending and one running copy per (job, instance)
+            self.db.job_queue.create_index(
+                [("job", 1), ("instance_full_id", 1), ("slot", 1)],
+                unique=True,
+                partialFilterExpression={"slot": {"$exists": True}}
+            )
+            self.db.job_queue.create_index([("slot", 1), ("priority", -1), ("available_at", 1)])
+
+            # Job Checkpoints (resumable clients/bills runs)
+            self.db.job_checkpoint_pages.create_index([("checkpoint_id", 1), ("endpoint", 1), ("page", 1)], unique=True)
+
             # TTL Indices
             # history_action_log: 30 days (30 * 24 * 60 * 60 = 2592000 seconds)
             self.db.history_action_log.create_index("occurred_at", expireAfterSeconds=2592000)
@@ -88,6 +120,20 @@ class Database:
             # last_reports: 7 days (7 * 24 * 60 * 60 = 604800 seconds)
             self.db.last_reports.create_index("last_run_timestamp", expireAfterSeconds=604800)
             
+            # job_queue: finished jobs kept 7 days
+            self.db.job_queue.create_index("finished_at", expireAfterSeconds=604800)
+            
+            # job_requests / job_consumers: unclaimed requests and dead consumers removed after 1 day
+            self.db.job_requests.create_index("requested_at", expireAfterSeconds=86400)
+            self.db.job_consumers.create_index("heartbeat_at", expireAfterSeconds=86400)
+            
+            # job_checkpoints / pages: orphans of abandoned runs removed after 1 day
+            self.db.job_checkpoints.create_index("updated_at", expireAfterSeconds=86400)
+            self.db.job_checkpoint_pages.create_index("created_at", expireAfterSeconds=86400)
+            
+            # pbx_sessions: removed once the cached cookie expires
+            self.db.pbx_sessions.create_index("expires_at", expireAfterSeconds=0)
+            
             return True
         except Exception as e:
             logger.error(f"Error ensuring indices: {e}")
@@ -173,7 +219,8 @@ class Database:
             logger.error(f"Seeding failed: {e}")
 
 def get_active_instances():
-    db = Database().get_db()
-    return list(db.instance_config.find({"status.active": True}))
+    # Served from the in-process registry (refreshed on instance_config changes)
+    from services.instance_registry import InstanceRegistry
+    return InstanceRegistry().get_active_instances()
 
 # Deprecated: save_bills and get_existing_bill_ids are no longer used in main.py
@@ -1,4 +1,4 @@
-import time, sys, json
+import time, sys, json, threading, copy
 import schedule
 from datetime import datetime
 from loguru import logger
@@ -7,36 +7,88 @@ from database import Database, get_active_instances
 from services.ixc_client import IxcClient
 from services.processor import Processor
 from services.dialer import Dialer
+from services.priority_index import DebtorPriorityIndex
 from services.report_service import ReportService
 from services.verification import VerificationService
 from services.metrics_service import MetricsService
 from services.blocked_contracts_service import BlockedContractsService
+from services.delayed_tasks import DelayedTaskQueue
+from services.job_queue import JobQueue, JobConsumer
+from services.instance_registry import InstanceRegistry
+from services.outbound_governor import OutboundGovernor
+from utils.instance_utils import get_instance_full_id
+from utils.shutdown import ShutdownRequested, install_signal_handlers, check_shutdown, shutdown_requested, wait_for_shutdown
+from services.checkpoint import JobCheckpoint
+from services.ari_events import AriEventStream
+from services.continuous_dialer import ContinuousDialer
+from services.fake_ari import FakeAri
+
+# Set up in service mode; one-shot jobs have no loop to run deferred tasks
+delayed_tasks = None
+# Set up when JOB_QUEUE_ENABLED (service) or in consumer mode
+job_queue = None
+
+def _select_instances(instance_full_ids=None):
+    """Active instances, optionally restricted to the given instance_full_ids (queued/deferred runs)."""
+    instances = get_active_instances()
+    if instance_full_ids is not None:
+        instances = [i for i in instances if get_instance_full_id(i) in instance_full_ids]
+    return instances
+
+def _instance_failed(job, instance, error, instance_full_ids):
+    """
+    Logs a failed instance and lets the job continue with the next one,
+    except when the run targets a single instance (queued or deferred job):
+    then the error is raised so the job is acked as failed.
+    """
+    logger.error(f"Error in {job} Job for {instance.get('instance_name')}: {error}")
+    if instance_full_ids is not None and len(instance_full_ids) == 1:
+        raise error
+
+def _bulk_write_chunks(collection, ops, checkpoint=None):
+    """Writes ops in BULK_CHUNK_SIZE chunks, skipping chunks an interrupted run already applied."""
+    totals = {"upserted": 0, "modified": 0, "matched": 0}
+    size = Config.BULK_CHUNK_SIZE
+    
+    for index, start in enumerate(range(0, len(ops), size)):
+        if checkpoint and index < checkpoint.written_chunks:
+            continue
+        # Stop between chunks, never in the middle of one
+        if checkpoint and shutdown_requested():
+            checkpoint.spill()
+        check_shutdown()
+        
+        res = collection.bulk_write(ops[start:start + size])
+        totals["upserted"] += res.upserted_count
+        totals["modified"] += res.modified_count
+        totals["matched"] += res.matched_count
+        
+        if checkpoint:
+            checkpoint.mark_chunk_written(index)
+    
+    return totals
 
-def _get_instance_full_id(instance):
-    name = instance.get('instance_name', 'default')
-    erp_type = instance.get('erp', {}).get('type', 'ixc')
-    oid = str(instance.get('_id', ''))
-    return f"{name}-{erp_type}-{oid}"
-
-def run_clients_update_job():
+def run_clients_update_job(instance_full_ids=None):
     logger.info("Starting Job: CLIENTS UPDATE")
-    instances = get_active_instances()
+    instances = _select_instances(instance_full_ids)
+    results = {}
     
     for instance in instances:
         try:
             start_time = time.time()
-            instance_full_id = _get_instance_full_id(instance)
+            instance_full_id = get_instance_full_id(instance)
             logger.info(f"Processing instance: {instance.get('instance_name')} (ID: {instance_full_id})")
             
             client = IxcClient(instance)
             processor = Processor(instance)
             db = Database().get_db()
+            checkpoint = JobCheckpoint("clients", instance_full_id, Config.CHECKPOINT_MAX_AGE_MINUTES)
 
             # Snapshot Before
             start_count = db.clients.count_documents({"instance_full_id": instance_full_id})
             
             # Fetch
-            raw_clients = client.get_clients()
+            raw_clients = client.get_clients(checkpoint=checkpoint)
             logger.info(f"Fetched {len(raw_clients)} clients")
             
             # Process
@@ -57,12 +109,12 @@ def run_clients_update_job():
                     )
                 
                 if ops:
-                    res = db.clients.bulk_write(ops)
+                    totals = _bulk_write_chunks(db.clients, ops, checkpoint)
                     logger.info(f"Saved/Updated {len(ops)} clients to 'clients' collection")
                     
-                    upserted_count = res.upserted_count
-                    modified_count = res.modified_count
-                    matched_count = res.matched_count
+                    upserted_count = totals["upserted"]
+                    modified_count = totals["modified"]
+                    matched_count = totals["matched"]
                 else:
                     upserted_count = 0
                     modified_count = 0
@@ -94,6 +146,8 @@ def run_clients_update_job():
                     upsert=True
                 )
             
+            checkpoint.clear()
+            
             # Snapshot After
             end_count = db.clients.count_documents({"instance_full_id": instance_full_id})
             delta = end_count - start_count
@@ -118,29 +172,34 @@ def run_clients_update_job():
             })
                 
             logger.info(f"Instance {instance.get('instance_name')} - Clients Job Finished. Delta: {delta}, Time: {elapsed_time}s")
+            results[instance_full_id] = len(raw_clients)
             
         except Exception as e:
-            logger.error(f"Error in Clients Job for {instance.get('instance_name')}: {e}")
+            _instance_failed("Clients", instance, e, instance_full_ids)
+    
+    return results
 
-def run_bills_update_job():
+def run_bills_update_job(instance_full_ids=None):
     logger.info("Starting Job: BILLS UPDATE")
-    instances = get_active_instances()
+    instances = _select_instances(instance_full_ids)
+    results = {}
     
     for instance in instances:
         try:
             start_time = time.time()
-            instance_full_id = _get_instance_full_id(instance)
+            instance_full_id = get_instance_full_id(instance)
             logger.info(f"Processing instance: {instance.get('instance_name')}")
             
             client = IxcClient(instance)
             processor = Processor(instance)
             db = Database().get_db()
+            checkpoint = JobCheckpoint("bills", instance_full_id, Config.CHECKPOINT_MAX_AGE_MINUTES)
             
             # Snapshot Before
             start_count = db.bills.count_documents({"instance_full_id": instance_full_id})
 
             # Fetch Bills
-            raw_bills = client.get_bills()
+            raw_bills = client.get_bills(checkpoint=checkpoint)
             processed_bills = processor.process_bills(raw_bills)
             
             # Fetch Clients from 'clients' collection
@@ -182,12 +241,12 @@ def run_bills_update_job():
                     )
                 
                 if ops:
-                    res = db.bills.bulk_write(ops)
+                    totals = _bulk_write_chunks(db.bills, ops, checkpoint)
                     logger.info(f"Saved/Updated {len(ops)} valid bills to 'bills' collection")
                     
-                    upserted_count = res.upserted_count
-                    modified_count = res.modified_count
-                    matched_count = res.matched_count
+                    upserted_count = totals["upserted"]
+                    modified_count = totals["modified"]
+                    matched_count = totals["matched"]
                 else:
                     upserted_count = 0
                     modified_count = 0
@@ -214,6 +273,14 @@ def run_bills_update_job():
                 }},
                 upsert=True
             )
+            
+            # Re-rank this instance's debtors for the dialer
+            try:
+                DebtorPriorityIndex(instance).refresh()
+            except Exception as e:
+                logger.error(f"Failed to refresh priority index for {instance_full_id}: {e}")
+                    
+            checkpoint.clear()
                     
             # Snapshot After
             end_count = db.bills.count_documents({"instance_full_id": instance_full_id})
@@ -239,17 +306,21 @@ def run_bills_update_job():
             })
                     
             logger.info(f"Instance {instance.get('instance_name')} - Bills Job Finished. Delta: {delta}, Time: {elapsed_time}s")
+            results[instance_full_id] = len(processed_bills)
 
         except Exception as e:
-            logger.error(f"Error in Bills Job for {instance.get('instance_name')}: {e}")
+            _instance_failed("Bills", instance, e, instance_full_ids)
+    
+    return results
 
-def run_dialer_job():
+def run_dialer_job(instance_full_ids=None):
     logger.info("Starting Job: DIALER")
-    instances = get_active_instances()
+    instances = _select_instances(instance_full_ids)
+    triggered = {}
     
     for instance in instances:
         try:
-            instance_full_id = _get_instance_full_id(instance)
+            instance_full_id = get_instance_full_id(instance)
             
             # Inject debug config if global debug is on
             if Config.DEBUG:
@@ -260,75 +331,52 @@ def run_dialer_job():
             
             if not dialer.check_window():
                 logger.info(f"Skipping dialer for {instance.get('instance_name')} (Outside Window)")
+                triggered[instance_full_id] = 0
                 continue
             
-            # Fetch bills from 'bills' collection
-            # Query: instance_full_id AND vencimento_status='expired'
-            # Note: expired_age logic is also filtered in build_queue, but efficient query helps
-            query = {
-                "instance_full_id": instance_full_id,
-                "vencimento_status": "expired"
-            }
+            # Over-dial by the pacing ratio when answer rates say some calls will not connect
+            limit = dialer.paced_limit()
             
-            bills = list(db.bills.find(query))
+            # Ranked debtors from the priority index (maintained by the bills sync)
+            queue, eligible_count = dialer.build_queue_from_index(limit=limit)
             
-            if not bills:
-                logger.info(f"No expired bills found for {instance.get('instance_name')}")
-                continue
-
-            queue, eligible_count = dialer.build_queue(bills)
+            if queue is None:
+                # Index not built yet for this instance: group the expired bills in Mongo
+                queue, eligible_count = dialer.build_queue_from_db(limit=limit)
             
             logger.info(f"Dialer for {instance.get('instance_name')}: {eligible_count} eligible, queuing {len(queue)} calls.")
             
             count = 0
             
-            for call in [queue[0]]:
-                # Check 4h window again (just in case multiple numbers for same client in queue)
-                # Although queue builder handles it now with the added_for_client flag.
+            # Originate the whole queue concurrently (bounded by channels and trunk limit)
+            results = dialer.originate_queue(queue)
+            
+            for result in results:
+                call = result['call']
                 
-                if dialer.trigger_call(call):
+                if result['ok']:
                     count += 1
                     
-                    # Add History to Bills and Action Log
-                    bill_ids = call.get('bill_ids', [])
-                    if bill_ids:
-                        occurred_at = datetime.now()
-                        
-                        # 1. Update Bill History (Legacy/Embedded)
-                        history_entry = {
-                            "occurred_at": occurred_at,
-                            "number": call['contact'],
-                            "status": "triggered"
-                        }
-                        db.bills.update_many(
-                            {"full_id": {"$in": bill_ids}},
-                            {"$push": {"call_history": history_entry}}
-                        )
-                        
-                        # 2. Insert into Action Log (New)
-                        # We create one log entry per bill involved
-                        log_entries = []
-                        for bid in bill_ids:
-                            log_entries.append({
-                                "full_id": bid,
-                                "action": "dialer_trigger",
-                                "occurred_at": occurred_at,
-                                "instance_full_id": instance_full_id,
-                                "details": {
-                                    "number": call['contact'],
-                                    "client_name": call['client_name'],
-                                    "status": "success"
-                                }
-                            })
-                        
-                        if log_entries:
-                            db.history_action_log.insert_many(log_entries)
-                        
-                        logger.debug(f"Logged action for {len(bill_ids)} bills.")
-                        
-                    time.sleep(1)
-            
-            logger.info(f"Triggered {count} calls for {instance.get('instance_name')}")
+                    # Add History to Bills and Action Log (buffered)
+                    dialer.record_trigger(call)
+            
+            # One unordered bulk write per collection for the whole run
+            flush_error = None
+            try:
+                dialer.flush_outcomes()
+            except Exception as e:
+                flush_error = str(e)
+                logger.error(f"Dialer outcomes for {instance.get('instance_name')} not fully written: {e}")
+            
+            failed = sum(1 for r in results if r['status'] == 'failed')
+            skipped = sum(1 for r in results if r['status'] == 'skipped')
+            logger.info(f"Triggered {count} calls for {instance.get('instance_name')} ({failed} failed, {skipped} skipped)")
+            
+            # Defer one report fetch for this instance so the CDRs of the calls above are collected
+            if count > 0 and job_queue is not None:
+                job_queue.enqueue("reports", instance_full_id, source="dialer", delay_seconds=Config.REPORT_DELAY_MINUTES * 60)
+            elif count > 0 and delayed_tasks is not None:
+                delayed_tasks.schedule("reports", instance_full_id, Config.REPORT_DELAY_MINUTES)
             
             # Log Stats
             db.history_action_log.insert_one({
@@ -338,36 +386,68 @@ def run_dialer_job():
                 "details": {
                     "eligible": eligible_count,
                     "queue_size": len(queue),
-                    "triggered": count
+                    "pacing_ratio": dialer.pacing.ratio(),
+                    "triggered": count,
+                    "failed": failed,
+                    "skipped": skipped,
+                    "flush_error": flush_error,
+                    "calls": [
+                        {"number": r['call']['contact'], "status": r['status'], "elapsed_seconds": r['elapsed']}
+                        for r in results
+                    ]
                 }
             })
+            
+            triggered[instance_full_id] = count
+            
+            # Calls skipped for shutdown end the job here, after their siblings were logged
+            check_shutdown()
 
         except Exception as e:
-            logger.error(f"Error in Dialer Job for {instance.get('instance_name')}: {e}")
-
-    # Schedule deferred report execution (5 minutes after dialer finishes)
-    def _run_report_once():
-        run_reports_update_job()
-        return schedule.CancelJob
-        
-    schedule.every(5).minutes.do(_run_report_once)
-    logger.info("Scheduled Reports Job to run in 5 minutes.")
+            _instance_failed("Dialer", instance, e, instance_full_ids)
+    
+    return triggered
 
-def run_reports_update_job():
+def run_reports_update_job(instance_full_ids=None):
     logger.info("Starting Job: REPORTS UPDATE")
-    instances = get_active_instances()
+    instances = _select_instances(instance_full_ids)
+    results = {}
     
+    services = []
     for instance in instances:
+        # Inject debug config if global debug is on
+        if Config.DEBUG:
+            instance['debug_calls'] = True
+        try:
+            services.append(ReportService(instance))
+        except Exception as e:
+            _instance_failed("Report", instance, e, instance_full_ids)
+    
+    # Instances reading the same Issabel host share one download per run;
+    # each one keeps the rows matching its channel pattern
+    groups = {}
+    if Config.CDR_SHARED_FETCH:
+        for service in services:
+            key = service.shared_fetch_key()
+            if key and service.check_window():
+                groups.setdefault(key, []).append(service)
+    
+    shared = {}
+    for key, group in groups.items():
+        if len(group) < 2:
+            continue
         try:
-            instance_full_id = _get_instance_full_id(instance)
+            shared[key] = ReportService.fetch_shared(group)
+        except Exception as e:
+            logger.error(f"Shared CDR fetch for {key[0]} failed, fetching per instance: {e}")
+    
+    for service in services:
+        instance = service.instance
+        try:
+            instance_full_id = service.instance_full_id
             logger.info(f"Processing reports for instance: {instance.get('instance_name')}")
             
-            # Inject debug config if global debug is on
-            if Config.DEBUG:
-                instance['debug_calls'] = True
-            
-            service = ReportService(instance)
-            count = service.process() or 0
+            count = service.process(shared.get(service.shared_fetch_key())) or 0
             
             # Log Stats
             Database().get_db().history_action_log.insert_one({
@@ -375,32 +455,46 @@ def run_reports_update_job():
                 "action": "job_reports_stats",
                 "occurred_at": datetime.now(),
                 "details": {
-                    "fetched": count
+                    "fetched": count,
+                    "new": service.last_stats.get("new", 0),
+                    "written": service.last_stats.get("written", 0),
+                    "unchanged": service.last_stats.get("unchanged", 0),
+                    "watermark": service.last_stats.get("watermark"),
+                    "source": service.last_stats.get("source"),
+                    "shared": service.last_stats.get("shared", False)
                 }
             })
             
             logger.info(f"Report job finished for {instance.get('instance_name')}")
+            results[instance_full_id] = count
         except Exception as e:
-            logger.error(f"Error in Report Job for {instance.get('instance_name')}: {e}")
+            _instance_failed("Report", instance, e, instance_full_ids)
+    
+    return results
 
-def run_metrics_job():
+def run_metrics_job(instance_full_ids=None):
     logger.info("Starting Job: METRICS")
-    instances = get_active_instances()
+    instances = _select_instances(instance_full_ids)
+    results = {}
     
     for instance in instances:
         try:
             service = MetricsService(instance)
             service.collect_metrics()
+            results[service.instance_full_id] = 1
         except Exception as e:
-            logger.error(f"Error in Metrics Job for {instance.get('instance_name')}: {e}")
+            _instance_failed("Metrics", instance, e, instance_full_ids)
+    
+    return results
 
-def run_client_types_update_job():
+def run_client_types_update_job(instance_full_ids=None):
     logger.info("Starting Job: CLIENT TYPES UPDATE")
-    instances = get_active_instances()
+    instances = _select_instances(instance_full_ids)
+    results = {}
     
     for instance in instances:
         try:
-            instance_full_id = _get_instance_full_id(instance)
+            instance_full_id = get_instance_full_id(instance)
             logger.info(f"Processing client types for instance: {instance.get('instance_name')}")
             
             client = IxcClient(instance)
@@ -447,20 +541,155 @@ def run_client_types_update_job():
                 }
             })
             
+            results[instance_full_id] = len(processed_types)
+            
         except Exception as e:
-            logger.error(f"Error in Client Types Job for {instance.get('instance_name')}: {e}")
+            _instance_failed("Client Types", instance, e, instance_full_ids)
+    
+    return results
 
-def run_blocked_contracts_job():
+def run_blocked_contracts_job(instance_full_ids=None):
     logger.info("Starting Job: BLOCKED CONTRACTS")
-    instances = get_active_instances()
+    instances = _select_instances(instance_full_ids)
+    results = {}
     
     for instance in instances:
         try:
             service = BlockedContractsService(instance)
             count = service.process()
             logger.info(f"Blocked Contracts Job finished for {instance.get('instance_name')}. Processed: {count}")
+            results[get_instance_full_id(instance)] = count
         except Exception as e:
-            logger.error(f"Error in Blocked Contracts Job for {instance.get('instance_name')}: {e}")
+            _instance_failed("Blocked Contracts", instance, e, instance_full_ids)
+    
+    return results
+
+JOB_HANDLERS = {
+    "clients": run_clients_update_job,
+    "bills": run_bills_update_job,
+    "dialer": run_dialer_job,
+    "reports": run_reports_update_job,
+    "metrics": run_metrics_job,
+    "client_types": run_client_types_update_job,
+    "blocked_contracts": run_blocked_contracts_job,
+}
+
+def run_continuous_dialer(fake_ari=False):
+    """
+    Long-running dialer: one ContinuousDialer thread per active instance that
+    originates the next call as soon as a trunk channel frees up (ARI events),
+    inside the operational window. Reports are fetched every
+    REPORT_DELAY_MINUTES for instances that placed calls since the last fetch.
+    With `fake_ari`, each instance dials a local ARI stand-in instead of its PBX;
+    the calls are still recorded like real ones, so the mode only runs on a
+    scratch '<DB_NAME>_bench' database and collects no reports.
+    """
+    logger.info("Starting Job: CONTINUOUS DIALER")
+    if fake_ari:
+        db_name = Database().get_db().name
+        if not db_name.endswith("_bench"):
+            logger.error(
+                f"--fake-ari writes call_history, dial_state and action logs for the synthetic calls; "
+                f"refusing to run on '{db_name}' (set DB_NAME to a scratch '*_bench' database)"
+            )
+            return
+    # Channel, trunk cap and charger edits made in the frontend reach the running dialers
+    InstanceRegistry().start_watching(Config.INSTANCE_REGISTRY_POLL_SECONDS)
+    install_signal_handlers()
+    stop_event = threading.Event()
+    dialers, threads, fakes = [], [], []
+    applied, overrides = {}, {}
+    
+    def _prepare(instance):
+        instance = copy.deepcopy(instance)
+        if Config.DEBUG:
+            instance['debug_calls'] = True
+        instance['asterisk'].update(overrides.get(get_instance_full_id(instance), {}))
+        return instance
+    
+    for instance in _select_instances():
+        try:
+            instance_full_id = get_instance_full_id(instance)
+            applied[instance_full_id] = instance
+            if fake_ari:
+                fake = FakeAri().start()
+                fakes.append(fake)
+                overrides[instance_full_id] = fake.pabx_overrides
+                events = fake
+            else:
+                events = AriEventStream(instance['asterisk'], app=instance['asterisk'].get('ari_app', Config.ARI_APP))
+            
+            dialer = ContinuousDialer(_prepare(instance), events, refill_seconds=Config.CONTINUOUS_DIALER_REFILL_SECONDS)
+            t = threading.Thread(target=dialer.run, args=(stop_event,), name=f"dialer-{dialer.instance_full_id}", daemon=True)
+            t.start()
+            dialers.append(dialer)
+            threads.append(t)
+        except Exception as e:
+            logger.error(f"Failed to start continuous dialer for {instance.get('instance_name')}: {e}")
+    
+    def _refresh_configs():
+        # The registry is kept fresh by its watcher; hand changed configs to the dialer threads
+        active = {get_instance_full_id(i): i for i in get_active_instances()}
+        for d in dialers:
+            instance = active.get(d.instance_full_id)
+            if instance == applied.get(d.instance_full_id):
+                continue
+            applied[d.instance_full_id] = instance
+            d.update_config(_prepare(instance) if instance is not None else None)
+    
+    reported = {}
+    def _collect_reports():
+        # Only instances that triggered calls since the previous fetch
+        ids = [d.instance_full_id for d in dialers if d.stats["triggered"] > reported.get(d.instance_full_id, 0)]
+        for d in dialers:
+            reported[d.instance_full_id] = d.stats["triggered"]
+        if ids:
+            try:
+                run_reports_update_job(ids)
+            except Exception as e:
+                # Single-instance runs raise; the next collection retries
+                logger.error(f"Report collection failed: {e}")
+    
+    # Synthetic calls have no CDRs on the PBX
+    if not fake_ari:
+        schedule.every(Config.REPORT_DELAY_MINUTES).minutes.do(_collect_reports)
+    schedule.every(30).minutes.do(OutboundGovernor().log_stats)
+    schedule.every(30).seconds.do(_refresh_configs)
+    
+    while not wait_for_shutdown(10):
+        schedule.run_pending()
+    
+    logger.info(f"Stopping continuous dialers (up to {Config.SHUTDOWN_GRACE_SECONDS}s)...")
+    stop_event.set()
+    deadline = time.monotonic() + Config.SHUTDOWN_GRACE_SECONDS
+    for t in threads:
+        t.join(max(deadline - time.monotonic(), 0))
+    for fake in fakes:
+        fake.stop()
+
+def dispatch_job(job):
+    """Scheduler entry point: enqueue one document per active instance, or run inline when the queue is off."""
+    if job_queue is None:
+        JOB_HANDLERS[job]()
+        return
+
+    enqueued = 0
+    for instance in get_active_instances():
+        if job_queue.enqueue(job, get_instance_full_id(instance)):
+            enqueued += 1
+    logger.info(f"Enqueued '{job}' for {enqueued} instances")
+
+def run_consumer(workers):
+    consumer = JobConsumer(job_queue, JOB_HANDLERS, workers=workers)
+    consumer.start()
+    return consumer
+
+def _drain(consumer):
+    """Lets consumer threads finish (or checkpoint) their current job before exiting."""
+    if consumer:
+        logger.info(f"Draining job consumer (up to {Config.SHUTDOWN_GRACE_SECONDS}s)...")
+        consumer.stop(timeout=Config.SHUTDOWN_GRACE_SECONDS)
+    logger.info("Service stopped.")
 
 def main():
     import argparse
@@ -468,9 +697,38 @@ def main():
     parser = argparse.ArgumentParser(description="Debt Collector Service")
     parser.add_argument(
         "--job", 
-        choices=["clients", "bills", "dialer", "reports", "service", "metrics", "client_types", "blocked_contracts"], 
+        choices=["clients", "bills", "dialer", "reports", "service", "metrics", "client_types", "blocked_contracts", "consumer", "dialer_continuous", "dialer-bench"], 
         default="service",
-        help="Run a specific job manually (once) or start the long-running service (default)"
+        help="Run a specific job manually (once), start the long-running service (default) or a job queue consumer"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=Config.JOB_QUEUE_WORKERS,
+        help="Worker threads for the job queue consumer"
+    )
+    parser.add_argument(
+        "--fake-ari",
+        action="store_true",
+        help="dialer_continuous: dial a local ARI stand-in with synthetic channel events instead of the PBX (requires a '*_bench' DB_NAME)"
+    )
+    parser.add_argument(
+        "--debtors",
+        type=int,
+        default=2000,
+        help="dialer-bench: synthetic debtors to seed"
+    )
+    parser.add_argument(
+        "--ari-latency",
+        type=float,
+        default=0.05,
+        help="dialer-bench: fake ARI response latency in seconds"
+    )
+    parser.add_argument(
+        "--ari-failure-rate",
+        type=float,
+        default=0.0,
+        help="dialer-bench: share of originations the fake ARI rejects"
     )
     parser.add_argument(
         "--debug", 
@@ -504,6 +762,15 @@ def main():
 
     logger.info(f"Starting application in mode: {args.job.upper()}")
 
+    # Benchmark runs on a scratch database and must register its Mongo command counter before connecting
+    if args.job == "dialer-bench":
+        from benchmarks import bench_dialer
+        if not is_debug:
+            logger.remove()
+            logger.add(sys.stderr, level="WARNING", format=log_format)
+        bench_dialer.run(args.debtors, args.ari_latency, args.ari_failure_rate)
+        return
+
     # Ensure DB Structure (Collections & Indices) ALWAYS on startup
     # This prevents running jobs against a broken or empty DB
     if not args.no_verify_db: 
@@ -528,6 +795,10 @@ def main():
         run_dialer_job()
         return
 
+    if args.job == "dialer_continuous":
+        run_continuous_dialer(fake_ari=args.fake_ari)
+        return
+
     if args.job == "reports":
         run_reports_update_job()
         return
@@ -544,11 +815,41 @@ def main():
         run_blocked_contracts_job()
         return
 
+    global delayed_tasks, job_queue
+
+    # Long-running modes keep the instance cache fresh while it is edited in the frontend
+    # and stop at a safe point on SIGTERM (container restarts) instead of dying mid-write
+    if args.job in ("service", "consumer"):
+        InstanceRegistry().start_watching(Config.INSTANCE_REGISTRY_POLL_SECONDS)
+        install_signal_handlers()
+
+    consumer = None
+
+    # Queue Consumer Mode: executes jobs enqueued by the scheduler or the frontend
+    if args.job == "consumer":
+        job_queue = JobQueue(lease_seconds=Config.JOB_QUEUE_LEASE_SECONDS)
+        consumer = run_consumer(args.workers)
+        schedule.every(30).minutes.do(OutboundGovernor().log_stats)
+        while not wait_for_shutdown(10):
+            schedule.run_pending()
+        _drain(consumer)
+        return
 
     # Service / Scheduler Mode
     if args.job == "service":
         logger.info("Auto Debt Collector Service Started (Daemon Mode)")
         
+        # Deferred per-instance report fetches (scheduled by the dialer job)
+        delayed_tasks = DelayedTaskQueue(persist=Config.DELAYED_TASKS_PERSIST)
+        delayed_tasks.register("reports", lambda instance_full_id: run_reports_update_job([instance_full_id]))
+        delayed_tasks.restore()
+        
+        # Queue mode: schedules only enqueue; JOB_QUEUE_WORKERS=0 leaves execution to separate consumers
+        if Config.JOB_QUEUE_ENABLED:
+            job_queue = JobQueue(lease_seconds=Config.JOB_QUEUE_LEASE_SECONDS)
+            if Config.JOB_QUEUE_WORKERS > 0:
+                consumer = run_consumer(Config.JOB_QUEUE_WORKERS)
+        
         # Ensure client_types has data
         try:
             if Database().get_db().client_types.count_documents({}) == 0:
@@ -558,40 +859,49 @@ def main():
             logger.error(f"Failed to initialize client_types: {e}")
         
         # Schedule definitions
-        schedule.every().day.at("07:00").do(run_clients_update_job)
-        schedule.every(1).hours.do(run_bills_update_job)
-        # Reports are now triggered 5min after dialer job ends
+        schedule.every().day.at("07:00").do(dispatch_job, "clients")
+        schedule.every(1).hours.do(dispatch_job, "bills")
+        # Reports are triggered per instance REPORT_DELAY_MINUTES after its dialer run (see delayed_tasks)
         # schedule.every(5).minutes.do(run_reports_update_job)
         
         # Blocked Contracts: every 30 minutes
-        schedule.every(30).minutes.do(run_blocked_contracts_job)
+        schedule.every(30).minutes.do(dispatch_job, "blocked_contracts")
         
         # Metrics: every 6 hours
-        schedule.every(30).minutes.do(run_metrics_job)
+        schedule.every(30).minutes.do(dispatch_job, "metrics")
         
         # Client Types: Once a week (Monday 6:00 AM)
-        schedule.every().monday.at("06:00").do(run_client_types_update_job)
+        schedule.every().monday.at("06:00").do(dispatch_job, "client_types")
 
         # Dialer: every 20 minutes between 8-18 (handled by check_window inside job)
-        schedule.every(20).minutes.do(run_dialer_job)
+        schedule.every(20).minutes.do(dispatch_job, "dialer")
         
-        # Run immediately on startup for debug/verification if debug is ON
-        if args.debug or Config.DEBUG:
-            logger.warning("DEBUG MODE: Running all jobs immediately for verification")
-            try:
-                run_clients_update_job()
-                run_client_types_update_job()
-                run_bills_update_job()
-                run_reports_update_job()
-                run_blocked_contracts_job()
-                run_dialer_job()
-            except Exception as e:
-                logger.critical(f"Startup jobs failed: {e}")
-                sys.exit(1)
+        # Outbound governor: per-host in-flight and queue wait summary
+        schedule.every(30).minutes.do(OutboundGovernor().log_stats)
         
-        while True:
-            schedule.run_pending()
-            time.sleep(10)
+        try:
+            # Run immediately on startup for debug/verification if debug is ON
+            if args.debug or Config.DEBUG:
+                logger.warning("DEBUG MODE: Running all jobs immediately for verification")
+                try:
+                    run_clients_update_job()
+                    run_client_types_update_job()
+                    run_bills_update_job()
+                    run_reports_update_job()
+                    run_blocked_contracts_job()
+                    run_dialer_job()
+                except Exception as e:
+                    logger.critical(f"Startup jobs failed: {e}")
+                    sys.exit(1)
+            
+            while not shutdown_requested():
+                schedule.run_pending()
+                delayed_tasks.run_due()
+                wait_for_shutdown(10)
+        except ShutdownRequested:
+            logger.warning("Shutdown requested: inline job stopped at a safe point (progress checkpointed)")
+        
+        _drain(consumer)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,69 @@
+import json
+import requests
+import websocket
+from loguru import logger
+
+class AriEventStream:
+    """
+    Reads Asterisk ARI events from the `/ari/events` WebSocket.
+
+    `events()` yields event dicts as they arrive and `None` every `idle_timeout`
+    seconds without traffic, so consumers can do periodic work. A dropped
+    connection is reopened with backoff; callers should `sync_channels()` after
+    `reconnected` flips to True since events may have been lost meanwhile.
+    """
+
+    def __init__(self, pabx, app="debt-collector", idle_timeout=1.0):
+        self.pabx = pabx
+        host = pabx.get('host', '127.0.0.1')
+        port = pabx.get('port', '8088')
+        schema = pabx.get('schema', 'http')
+        ws_schema = "wss" if schema == "https" else "ws"
+        self.auth = (pabx.get('username', 'admin'), pabx.get('password', 'admin'))
+        self.base_url = f"{schema}://{host}:{port}/ari"
+        self.ws_url = (
+            f"{ws_schema}://{host}:{port}/ari/events"
+            f"?app={app}&subscribeAll=true&api_key={self.auth[0]}:{self.auth[1]}"
+        )
+        self.idle_timeout = idle_timeout
+        self.reconnected = False
+        self._ws = None
+
+    def _connect(self):
+        self._ws = websocket.create_connection(self.ws_url, timeout=self.idle_timeout)
+        logger.info(f"Connected to ARI events at {self.base_url}")
+
+    def events(self, stop_event):
+        backoff = 1
+        while not stop_event.is_set():
+            try:
+                if self._ws is None:
+                    self._connect()
+                    backoff = 1
+                raw = self._ws.recv()
+                if raw:
+                    yield json.loads(raw)
+            except websocket.WebSocketTimeoutException:
+                yield None
+            except (websocket.WebSocketException, OSError, ValueError) as e:
+                logger.warning(f"ARI event stream error: {e}. Reconnecting in {backoff}s")
+                self.close()
+                self.reconnected = True
+                stop_event.wait(backoff)
+                backoff = min(backoff * 2, 30)
+        self.close()
+
+    def sync_channels(self):
+        """Returns the live channels reported by ARI ([{"id", "name", ...}])."""
+        resp = requests.get(f"{self.base_url}/channels", auth=self.auth, timeout=5)
+        resp.raise_for_status()
+        self.reconnected = False
+        return resp.json()
+
+    def close(self):
+        if self._ws is not None:
+            try:
+                self._ws.close()
+            except Exception:
+                pass
+            self._ws = None
@@ -2,13 +2,14 @@ from datetime import datetime
 from loguru import logger
 from database import Database
 from services.ixc_client import IxcClient
+from utils.instance_utils import get_instance_full_id
 
 class BlockedContractsService:
     def __init__(self, instance_config):
         self.instance_config = instance_config
         self.instance_name = instance_config.get('instance_name', 'default')
         self.erp_type = instance_config.get('erp', {}).get('type', 'ixc')
-        self.instance_full_id = f"{self.instance_name}-{self.erp_type}-{instance_config.get('_id', '')}"
+        self.instance_full_id = get_instance_full_id(instance_config)
         self.db = Database().get_db()
         self.client = IxcClient(instance_config)
 
@@ -149,4 +150,4 @@ class BlockedContractsService:
 
         except Exception as e:
             logger.error(f"Error in BlockedContractsService: {e}")
-            return 0
+            raise
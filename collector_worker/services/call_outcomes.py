@@ -0,0 +1,102 @@
+from loguru import logger
+from pymongo import UpdateMany, UpdateOne
+from database import Database
+from services.dial_state import DialStateStore
+
+class CallOutcomeService:
+    """
+    Materializes the final outcome of dialer-originated calls once their CDR
+    is ingested, so readers do not join 'last_reports' themselves.
+
+    The dialer stores the dialed number in last_reports under the ARI channel
+    id (the CDR uniqueid) and pushes a `call_history` entry with the same
+    uniqueid onto the call's bills. For each new CDR with a disposition:
+
+    - bills: the matching `call_history` entry gets status "completed",
+      disposition, duration and answered; `last_call_outcome` is set
+    - dial_state: last disposition/duration/answered of the number
+      (answered calls also increment `answered_total`)
+
+    The applied CDR fingerprint is kept in last_reports as `outcome_fp`, so
+    a CDR rewritten with another disposition or duration (`cdr_fp` changed)
+    is applied again; `answered_total` then only moves by the difference.
+    """
+
+    def __init__(self, instance_full_id):
+        self.db = Database().get_db()
+        self.instance_full_id = instance_full_id
+
+    @staticmethod
+    def _duration(value):
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return None
+
+    def pending(self, uniqueids):
+        """Dialer CDRs among `uniqueids` whose current version was not applied yet, oldest first."""
+        return list(self.db.last_reports.find(
+            {
+                "uniqueid": {"$in": list(uniqueids)},
+                "number": {"$exists": True},
+                "disposition": {"$ne": None},
+                "$expr": {"$ne": ["$outcome_fp", "$cdr_fp"]}
+            },
+            {"_id": 0, "uniqueid": 1, "number": 1, "disposition": 1, "duration": 1, "calldate": 1,
+             "cdr_fp": 1, "outcome_fp": 1, "outcome_answered": 1, "dial_state_applied": 1}
+        ).sort("calldate", 1))
+
+    @staticmethod
+    def _previously_answered(doc, answered):
+        """Answered flag of the outcome applied before (None = first application)."""
+        if "outcome_fp" in doc:
+            return doc.get("outcome_answered", False)
+        if doc.get("dial_state_applied"):
+            # Applied before outcome_fp was stored: its answered flag is unknown, count nothing again
+            return answered
+        return None
+
+    def apply(self, uniqueids):
+        """Writes the outcomes of the given CDRs to bills and dial_state in bulk; returns how many were applied."""
+        if not uniqueids:
+            return 0
+        docs = self.pending(uniqueids)
+        if not docs:
+            return 0
+
+        outcomes = []
+        bill_ops = []
+        report_ops = []
+        for doc in docs:
+            answered = doc["disposition"] == "ANSWERED"
+            outcome = {
+                "uniqueid": doc["uniqueid"],
+                "number": doc["number"],
+                "disposition": doc["disposition"],
+                "duration": self._duration(doc.get("duration")),
+                "answered": answered,
+                "calldate": doc.get("calldate")
+            }
+            outcomes.append({**outcome, "previously_answered": self._previously_answered(doc, answered)})
+            bill_ops.append(UpdateMany(
+                {"instance_full_id": self.instance_full_id, "call_history.uniqueid": doc["uniqueid"]},
+                {"$set": {
+                    "call_history.$[call].status": "completed",
+                    "call_history.$[call].disposition": outcome["disposition"],
+                    "call_history.$[call].duration": outcome["duration"],
+                    "call_history.$[call].answered": outcome["answered"],
+                    "last_call_outcome": outcome
+                }},
+                array_filters=[{"call.uniqueid": doc["uniqueid"]}]
+            ))
+            report_ops.append(UpdateOne(
+                {"uniqueid": doc["uniqueid"]},
+                {"$set": {"outcome_fp": doc.get("cdr_fp"), "outcome_answered": answered, "dial_state_applied": True}}
+            ))
+
+        # Ordered, so the newest call of a bill is the last_call_outcome left behind
+        bills_updated = self.db.bills.bulk_write(bill_ops).modified_count
+        applied = DialStateStore(self.instance_full_id).record_outcomes(outcomes)
+        self.db.last_reports.bulk_write(report_ops, ordered=False)
+        logger.debug(f"Applied {applied} call outcomes to dial_state and {bills_updated} bills")
+        return applied
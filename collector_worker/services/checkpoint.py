@@ -0,0 +1,110 @@
+from datetime import datetime, timedelta
+from loguru import logger
+from database import Database
+
+class JobCheckpoint:
+    """
+    Per-instance progress of a job, so an interrupted run can resume.
+
+    The checkpoint document ('job_checkpoints') tracks which ERP endpoints were
+    fully fetched and how many bulk-write chunks were applied. Fetched records
+    are only held in memory during a run; they are spilled to
+    'job_checkpoint_pages' when a shutdown is requested, so a resumed run does
+    not fetch them again. A run that died without spilling fetches again.
+    Checkpoints older than `max_age_minutes` are discarded on load, and the
+    checkpoint is cleared once the job finishes.
+    """
+    # Records per spilled document (keeps each one well under the BSON limit)
+    SPILL_CHUNK_SIZE = 1000
+
+    def __init__(self, job, instance_full_id, max_age_minutes=120):
+        self.db = Database().get_db()
+        self.id = f"{job}:{instance_full_id}"
+        self.job = job
+        self.instance_full_id = instance_full_id
+        self.max_age = timedelta(minutes=max_age_minutes)
+        self.state = self._load()
+        self._held = {}
+
+    def _load(self):
+        doc = self.db.job_checkpoints.find_one({"_id": self.id})
+        if doc and datetime.now() - doc.get("updated_at", datetime.min) <= self.max_age:
+            logger.info(
+                f"Resuming {self.job} for {self.instance_full_id}: "
+                f"fetched {doc.get('fetched', [])}, {doc.get('written_chunks', 0)} chunks written"
+            )
+            return doc
+
+        if doc:
+            logger.info(f"Discarding stale {self.job} checkpoint for {self.instance_full_id}")
+            self.clear()
+
+        now = datetime.now()
+        return {"_id": self.id, "job": self.job, "instance_full_id": self.instance_full_id,
+                "started_at": now, "updated_at": now, "fetched": [], "written_chunks": 0}
+
+    def _save(self, **fields):
+        self.state.update(fields)
+        self.state["updated_at"] = datetime.now()
+        self.db.job_checkpoints.replace_one({"_id": self.id}, self.state, upsert=True)
+
+    # --- Fetch progress ---
+
+    def load_pages(self, endpoint):
+        """Returns (records, last_page, total) spilled for `endpoint` by an interrupted run."""
+        records = []
+        last_page = 0
+        total = None
+        cursor = self.db.job_checkpoint_pages.find(
+            {"checkpoint_id": self.id, "endpoint": endpoint}
+        ).sort("page", 1)
+        for doc in cursor:
+            records.extend(doc.get("records", []))
+            last_page = doc.get("last_page", last_page)
+            total = doc.get("total", total)
+        return records, last_page, total
+
+    def hold(self, endpoint, records, last_page, total):
+        """Keeps a reference to the records fetched so far; nothing is written."""
+        self._held[endpoint] = (records, last_page, total)
+
+    def spill(self):
+        """Writes the held records to 'job_checkpoint_pages'; called once a shutdown is requested."""
+        for endpoint, (records, last_page, total) in self._held.items():
+            self.db.job_checkpoint_pages.delete_many({"checkpoint_id": self.id, "endpoint": endpoint})
+            docs = [
+                {"checkpoint_id": self.id, "endpoint": endpoint, "page": index,
+                 "records": records[start:start + self.SPILL_CHUNK_SIZE],
+                 "last_page": last_page, "total": total, "created_at": datetime.now()}
+                for index, start in enumerate(range(0, len(records), self.SPILL_CHUNK_SIZE))
+            ]
+            if docs:
+                self.db.job_checkpoint_pages.insert_many(docs)
+            logger.info(f"Spilled {len(records)} {endpoint} records to the {self.job} checkpoint")
+        self._held = {}
+        self._save()
+
+    def is_fetched(self, endpoint):
+        return endpoint in self.state.get("fetched", [])
+
+    def mark_fetched(self, endpoint, records, last_page=None, total=None):
+        self.hold(endpoint, records, last_page, total)
+        if not self.is_fetched(endpoint):
+            self._save(fetched=self.state.get("fetched", []) + [endpoint])
+
+    def restart_fetch(self, endpoint):
+        """Forgets a fetch whose records were never spilled; chunk boundaries of the new fetch may differ."""
+        self._save(fetched=[e for e in self.state.get("fetched", []) if e != endpoint], written_chunks=0)
+
+    # --- Write progress ---
+
+    @property
+    def written_chunks(self):
+        return self.state.get("written_chunks", 0)
+
+    def mark_chunk_written(self, chunk_index):
+        self._save(written_chunks=chunk_index + 1)
+
+    def clear(self):
+        self.db.job_checkpoints.delete_one({"_id": self.id})
+        self.db.job_checkpoint_pages.delete_many({"checkpoint_id": self.id})
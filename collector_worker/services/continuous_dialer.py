@@ -0,0 +1,206 @@
+import time
+from collections import deque
+from loguru import logger
+from services.dialer import Dialer
+from utils.shutdown import shutdown_requested
+
+class ContinuousDialer:
+    """
+    Long-running dialer for one instance, driven by ARI channel events.
+
+    Live channels on the instance trunk (ours and any other call using it) are
+    tracked from ChannelCreated/StasisStart and ChannelDestroyed, and the next
+    eligible debtor is originated as soon as occupancy drops below
+    `asterisk.num_channel_available` (times the pacing ratio for channels not
+    yet answered, see PacingEngine). Candidates are loaded from the priority
+    index (or an aggregation over the bills, before the index exists) at most every
+    `refill_seconds`, and re-checked against dial_state right before each
+    origination.
+
+    `events` is an AriEventStream (or the FakeAri stand-in): anything with
+    `events(stop_event)`, `sync_channels()` and a `reconnected` flag.
+    Config edits are passed in with update_config() and applied by the
+    dialer thread itself.
+    """
+
+    OCCUPY_EVENTS = ("ChannelCreated", "StasisStart")
+    STATE_EVENTS = ("ChannelStateChange",)
+    RELEASE_EVENTS = ("ChannelDestroyed",)
+
+    def __init__(self, instance_config, events, refill_seconds=60, sync_seconds=300, refill_factor=5, flush_seconds=10):
+        self.events = events
+        self.refill_seconds = refill_seconds
+        self.sync_seconds = sync_seconds
+        self.flush_seconds = flush_seconds
+        self.refill_factor = refill_factor
+        self._configure(instance_config)
+        self._next_config = None
+        self.paused = False
+
+        self.busy = set()
+        self.up = set()
+        self.pending = deque()
+        self.stats = {"triggered": 0, "failed": 0, "events": 0, "flush_failed": 0}
+        self._last_refill = 0.0
+        self._last_sync = 0.0
+        self._retry_at = 0.0
+        self._last_flush = 0.0
+
+    def _configure(self, instance_config):
+        self.dialer = Dialer(instance_config)
+        self.instance_full_id = self.dialer.instance_full_id
+        self.instance_name = instance_config.get('instance_name')
+
+        pabx = self.dialer.pabx
+        self.capacity = max(int(pabx.get('num_channel_available', 10)), 1)
+        self.refill_size = self.capacity * self.refill_factor
+        # Asterisk names trunk channels "<tech>/<trunk>-<sequence>"
+        self.channel_prefix = f"{pabx.get('channel_type', 'SIP')}/{pabx.get('channel', 'trunk')}-"
+        self.trunk_cap = pabx.get('max_calls_per_trunk')
+
+    def update_config(self, instance_config):
+        """
+        Hands an edited instance config to the dialer thread, which applies it
+        before its next fill; None pauses dialing (instance deactivated).
+        """
+        self._next_config = instance_config if instance_config is not None else False
+
+    def _apply_config(self):
+        config, self._next_config = self._next_config, None
+        if config is None:
+            return
+        if config is False:
+            if not self.paused:
+                logger.info(f"Continuous dialer for {self.instance_name} paused (instance no longer active)")
+            self.paused = True
+            self.pending.clear()
+            return
+
+        # Buffered writes belong to the old Dialer
+        self._flush()
+        self._configure(config)
+        self.paused = False
+        self.pending.clear()
+        self._last_refill = 0.0
+        self.sync()
+        logger.info(f"Continuous dialer for {self.instance_name} reloaded its config ({self.capacity} channels)")
+
+    def _is_trunk_channel(self, channel):
+        return (channel.get('name') or '').startswith(self.channel_prefix)
+
+    def handle_event(self, event):
+        channel = event.get('channel') or {}
+        channel_id = channel.get('id')
+        if not channel_id:
+            return
+
+        self.stats["events"] += 1
+        if event.get('type') in self.OCCUPY_EVENTS and self._is_trunk_channel(channel):
+            self.busy.add(channel_id)
+        elif event.get('type') in self.STATE_EVENTS and channel.get('state') == "Up" and channel_id in self.busy:
+            self.up.add(channel_id)
+        elif event.get('type') in self.RELEASE_EVENTS:
+            self.busy.discard(channel_id)
+            self.up.discard(channel_id)
+
+    def sync(self):
+        """Rebuilds occupancy from the live channel list (startup, reconnects, periodic drift check)."""
+        try:
+            channels = self.events.sync_channels()
+        except Exception as e:
+            logger.warning(f"Failed to sync ARI channels for {self.instance_name}: {e}")
+            return
+        trunk_channels = [c for c in channels if c.get('id') and self._is_trunk_channel(c)]
+        self.busy = {c['id'] for c in trunk_channels}
+        self.up = {c['id'] for c in trunk_channels if c.get('state') == "Up"}
+        self._last_sync = time.monotonic()
+        logger.debug(f"{self.instance_name}: {len(self.busy)}/{self.capacity} channels busy after sync")
+
+    def _refill(self):
+        self._last_refill = time.monotonic()
+        queue, eligible_count = self.dialer.build_queue_from_index(limit=self.refill_size)
+        if queue is None:
+            queue, eligible_count = self.dialer.build_queue_from_db(limit=self.refill_size)
+        self.pending = deque(queue)
+        logger.info(f"Continuous dialer for {self.instance_name}: {eligible_count} eligible, {len(queue)} candidates loaded")
+
+    def _next_call(self):
+        if not self.pending and time.monotonic() - self._last_refill >= self.refill_seconds:
+            self._refill()
+
+        while self.pending:
+            call = self.pending.popleft()
+            # The number may have been dialed since the refill (batch job, another worker)
+            if self.dialer.can_call_number(call['contact']):
+                return call
+        return None
+
+    def target_in_flight(self):
+        """
+        Connected calls plus the free channels times the pacing ratio: ringing
+        calls that will not be answered are covered by extra originations.
+        """
+        connected = len(self.up)
+        cap = None if self.trunk_cap is None else int(self.trunk_cap) - connected
+        return connected + self.dialer.pacing.launch_limit(self.capacity - connected, cap=cap)
+
+    def fill(self):
+        """Originates calls until the paced target is in flight or no candidate is left."""
+        if self.paused:
+            return
+        if not self.dialer.check_window():
+            # Re-evaluate eligibility from scratch when the window reopens
+            self.pending.clear()
+            return
+
+        target = self.target_in_flight()
+        while len(self.busy) < target and time.monotonic() >= self._retry_at and not shutdown_requested():
+            call = self._next_call()
+            if call is None:
+                return
+
+            if not self.dialer.trigger_call(call):
+                self.stats["failed"] += 1
+                # ARI is likely unavailable; the dropped candidate comes back on the next refill
+                self._retry_at = time.monotonic() + 5
+                return
+
+            self.stats["triggered"] += 1
+            if call.get('uniqueid'):
+                # Counted right away; ChannelCreated for the same id is a no-op
+                self.busy.add(call['uniqueid'])
+            self.dialer.record_trigger(call)
+
+    def _flush(self):
+        try:
+            self.dialer.flush_outcomes()
+        except Exception as e:
+            self.stats["flush_failed"] += 1
+            logger.error(f"Continuous dialer for {self.instance_name} lost call writes: {e}")
+
+    def run(self, stop_event):
+        logger.info(f"Continuous dialer started for {self.instance_name} ({self.capacity} channels)")
+        self.sync()
+        try:
+            for event in self.events.events(stop_event):
+                if event is not None:
+                    self.handle_event(event)
+                if self._next_config is not None:
+                    self._apply_config()
+                if self.events.reconnected or time.monotonic() - self._last_sync >= self.sync_seconds:
+                    self.sync()
+                try:
+                    self.fill()
+                except Exception as e:
+                    logger.error(f"Continuous dialer error for {self.instance_name}: {e}")
+                    self._retry_at = time.monotonic() + 5
+                # Call writes are buffered; flush at least every flush_seconds while calls trickle in
+                if time.monotonic() - self._last_flush >= self.flush_seconds:
+                    self._flush()
+                    self._last_flush = time.monotonic()
+        finally:
+            self._flush()
+            logger.info(
+                f"Continuous dialer stopped for {self.instance_name}: "
+                f"{self.stats['triggered']} triggered, {self.stats['failed']} failed, {self.stats['events']} events, {self.stats['flush_failed']} failed flushes"
+            )
@@ -0,0 +1,110 @@
+import heapq
+import itertools
+import threading
+from datetime import datetime, timedelta
+from loguru import logger
+from database import Database
+
+class DelayedTaskQueue:
+    """
+    One-shot delayed tasks keyed by (task, instance_full_id).
+
+    Scheduling a key that is already pending moves its run time instead of
+    adding a second entry, so each instance gets exactly one execution per
+    debounce window. Entries live in an in-memory heap and, when persistence
+    is enabled, are mirrored in the 'delayed_tasks' collection so a restart
+    does not lose them.
+    """
+
+    def __init__(self, persist=True):
+        self.persist = persist
+        self.db = Database().get_db() if persist else None
+        self._heap = []
+        self._pending = {}  # key -> run_at (authoritative; heap entries may be stale)
+        self._handlers = {}
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(task, instance_full_id):
+        return f"{task}:{instance_full_id}"
+
+    def register(self, task, handler):
+        """Registers the callable executed for `task`. It receives the instance_full_id."""
+        self._handlers[task] = handler
+
+    def schedule(self, task, instance_full_id, delay_minutes):
+        run_at = datetime.now() + timedelta(minutes=delay_minutes)
+        key = self._key(task, instance_full_id)
+
+        with self._lock:
+            replaced = key in self._pending
+            self._pending[key] = run_at
+            heapq.heappush(self._heap, (run_at, next(self._seq), key, task, instance_full_id))
+
+        if self.persist:
+            self.db.delayed_tasks.update_one(
+                {"_id": key},
+                {"$set": {"task": task, "instance_full_id": instance_full_id, "run_at": run_at}},
+                upsert=True
+            )
+
+        action = "Rescheduled" if replaced else "Scheduled"
+        logger.info(f"{action} '{task}' for {instance_full_id} at {run_at.strftime('%H:%M:%S')}")
+
+    def restore(self):
+        """Reloads persisted tasks into the heap (call once on startup)."""
+        if not self.persist:
+            return 0
+
+        restored = 0
+        with self._lock:
+            for doc in self.db.delayed_tasks.find({}):
+                key = doc["_id"]
+                self._pending[key] = doc["run_at"]
+                heapq.heappush(self._heap, (doc["run_at"], next(self._seq), key, doc["task"], doc["instance_full_id"]))
+                restored += 1
+
+        if restored:
+            logger.info(f"Restored {restored} delayed tasks from database")
+        return restored
+
+    def pending(self):
+        with self._lock:
+            return dict(self._pending)
+
+    def _pop_due(self, now):
+        due = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                run_at, _, key, task, instance_full_id = heapq.heappop(self._heap)
+                # Skip entries superseded by a later reschedule
+                if self._pending.get(key) != run_at:
+                    continue
+                del self._pending[key]
+                due.append((key, run_at, task, instance_full_id))
+        return due
+
+    def run_due(self):
+        """
+        Executes every task whose run time has passed. Returns how many ran.
+        The persisted entry is removed only after its handler returns, so a
+        shutdown (ShutdownRequested) mid-task leaves it for the next start.
+        """
+        due = self._pop_due(datetime.now())
+
+        for key, run_at, task, instance_full_id in due:
+            handler = self._handlers.get(task)
+            if not handler:
+                logger.warning(f"No handler registered for delayed task '{task}'. Dropping.")
+            else:
+                try:
+                    handler(instance_full_id)
+                except Exception as e:
+                    logger.error(f"Delayed task '{task}' failed for {instance_full_id}: {e}")
+
+            if self.persist:
+                # A reschedule made while the task ran has another run_at and stays
+                self.db.delayed_tasks.delete_one({"_id": key, "run_at": run_at})
+
+        return len(due)
@@ -0,0 +1,137 @@
+from datetime import datetime, timedelta
+from loguru import logger
+from pymongo import UpdateOne
+from database import Database
+
+class DialStateStore:
+    """
+    Compact per-number dial state ('dial_state'), one document per
+    (instance_full_id, number) holding today's attempt count, the last
+    attempt time and the last CDR disposition.
+
+    Updated atomically when a call is triggered and when its CDR arrives, so
+    the dialer checks eligibility with one indexed lookup instead of scanning
+    'history_action_log' (which stays an append-only audit trail).
+    """
+
+    def __init__(self, instance_full_id):
+        self.db = Database().get_db()
+        self.instance_full_id = instance_full_id
+
+    @staticmethod
+    def _today():
+        return datetime.now().strftime("%Y-%m-%d")
+
+    def get_many(self, numbers):
+        """Returns {number: {"count_today", "last_call", "last_disposition"}} for numbers with state."""
+        if not numbers:
+            return {}
+
+        today = self._today()
+        cursor = self.db.dial_state.find(
+            {"instance_full_id": self.instance_full_id, "number": {"$in": list(numbers)}},
+            {"_id": 0, "number": 1, "day": 1, "count_today": 1, "last_attempt_at": 1, "last_disposition": 1}
+        )
+        return {
+            doc["number"]: {
+                # The counter belongs to the day it was written on
+                "count_today": doc.get("count_today", 0) if doc.get("day") == today else 0,
+                "last_call": doc.get("last_attempt_at"),
+                "last_disposition": doc.get("last_disposition")
+            }
+            for doc in cursor
+        }
+
+    def attempt_op(self, number, at=None):
+        """UpdateOne counting a triggered call; the daily counter restarts when the stored day is not today."""
+        at = at or datetime.now()
+        today = at.strftime("%Y-%m-%d")
+        return UpdateOne(
+            {"instance_full_id": self.instance_full_id, "number": number},
+            [{"$set": {
+                "instance_full_id": self.instance_full_id,
+                "number": number,
+                "count_today": {"$cond": [
+                    {"$eq": ["$day", today]},
+                    {"$add": [{"$ifNull": ["$count_today", 0]}, 1]},
+                    1
+                ]},
+                "day": today,
+                "last_attempt_at": at,
+                "attempts_total": {"$add": [{"$ifNull": ["$attempts_total", 0]}, 1]}
+            }}],
+            upsert=True
+        )
+
+    def record_attempt(self, number, at=None):
+        """Counts a single triggered call (the dialer batches attempt_op() instead)."""
+        self.db.dial_state.bulk_write([self.attempt_op(number, at)])
+
+    def record_outcomes(self, outcomes):
+        """
+        Applies CDR outcomes in bulk. `outcomes` is a list of dicts with
+        number, disposition, duration, calldate and optionally answered
+        (default: disposition == ANSWERED). A CDR applied again after it
+        changed passes the earlier answered flag as `previously_answered`,
+        so `answered_total` only moves by the difference.
+        """
+        ops = []
+        for o in outcomes:
+            answered = o.get("answered", o.get("disposition") == "ANSWERED")
+            previously = o.get("previously_answered")
+            delta = int(answered) - int(bool(previously)) if previously is not None else int(answered)
+            update = {"$set": {
+                "last_disposition": o.get("disposition"),
+                "last_duration": o.get("duration"),
+                "last_answered": answered,
+                "last_disposition_at": o.get("calldate")
+            }}
+            if delta:
+                update["$inc"] = {"answered_total": delta}
+            ops.append(UpdateOne({"instance_full_id": self.instance_full_id, "number": o["number"]}, update))
+
+        if ops:
+            self.db.dial_state.bulk_write(ops, ordered=False)
+        return len(ops)
+
+    def has_state(self):
+        return self.db.dial_state.find_one({"instance_full_id": self.instance_full_id}, {"_id": 1}) is not None
+
+    def backfill_from_history(self, days=30):
+        """Seeds dial_state from 'history_action_log' for an instance that has none yet (one-time migration)."""
+        now = datetime.now()
+        today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        today = self._today()
+        pipeline = [
+            {"$match": {
+                "instance_full_id": self.instance_full_id,
+                "action": "dialer_trigger",
+                "occurred_at": {"$gte": now - timedelta(days=days)}
+            }},
+            {"$group": {
+                "_id": "$details.number",
+                "count_today": {"$sum": {"$cond": [{"$gte": ["$occurred_at", today_start]}, 1, 0]}},
+                "last_attempt_at": {"$max": "$occurred_at"},
+                "attempts_total": {"$sum": 1}
+            }}
+        ]
+
+        ops = []
+        for doc in self.db.history_action_log.aggregate(pipeline):
+            if not doc["_id"]:
+                continue
+            ops.append(UpdateOne(
+                {"instance_full_id": self.instance_full_id, "number": doc["_id"]},
+                {"$setOnInsert": {
+                    "day": today,
+                    "count_today": doc["count_today"],
+                    "last_attempt_at": doc["last_attempt_at"],
+                    "attempts_total": doc["attempts_total"]
+                }},
+                upsert=True
+            ))
+
+        if ops:
+            self.db.dial_state.bulk_write(ops, ordered=False)
+            logger.info(f"Backfilled dial_state for {len(ops)} numbers of {self.instance_full_id}")
+        return len(ops)
@@ -1,10 +1,33 @@
 import requests
 import base64
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
 from loguru import logger
 from datetime import datetime, timedelta
-import re
 from database import Database
 from utils.time_utils import is_within_operational_window
+from utils.instance_utils import get_instance_full_id
+from utils.phone_utils import dialable_numbers
+from services.outbound_governor import OutboundGovernor, host_key
+from services.dial_state import DialStateStore
+from services.dialer_outcomes import DialerOutcomeBuffer
+from services.pacing import PacingEngine
+from config import Config
+from services.priority_index import DebtorPriorityIndex, candidate_pipeline, group_to_candidate
+from utils.shutdown import shutdown_requested
+
+# Batches on the same trunk are sized and originated one at a time per process
+# (instances may share a trunk), so each sees the channels the previous one created
+_trunk_locks = {}
+_trunk_locks_lock = threading.Lock()
+
+def _get_trunk_lock(trunk_key):
+    with _trunk_locks_lock:
+        if trunk_key not in _trunk_locks:
+            _trunk_locks[trunk_key] = threading.Lock()
+        return _trunk_locks[trunk_key]
 
 class Dialer:
     def __init__(self, instance_config):
@@ -14,67 +37,102 @@ class Dialer:
         self.dial_per_day = instance_config.get('charger', {}).get('dial_per_day', 3)
         self.dial_interval = instance_config.get('charger', {}).get('dial_interval', 4)
         
-        # Construct instance_full_id for DB queries
-        name = instance_config.get('instance_name', 'default')
-        erp_type = instance_config.get('erp', {}).get('type', 'ixc')
-        oid = str(instance_config.get('_id', ''))
-        self.instance_full_id = f"{name}-{erp_type}-{oid}"
+        self.instance_full_id = get_instance_full_id(instance_config)
         
         self.db = Database().get_db()
+        self.dial_state = DialStateStore(self.instance_full_id)
+        self.priority = DebtorPriorityIndex(instance_config)
+        self.pacing = PacingEngine(instance_config)
+        self.outcomes = DialerOutcomeBuffer(self.instance_full_id, Config.DIALER_FLUSH_EVERY)
 
     def check_window(self):
         """Returns True if current time is within allowed call window"""
         return is_within_operational_window(self.config.get('debug_calls', False))
 
-    def can_call_number(self, number):
+    def load_dial_history(self, numbers):
+        """
+        Today's call count and last call time for all `numbers` in one indexed
+        lookup on 'dial_state'. Returns {number: {"count_today": int, "last_call": datetime}};
+        numbers never called are absent.
+        """
+        if not numbers:
+            return {}
+        
+        # Instances that dialed before dial_state existed are seeded from the action log once
+        if not self.dial_state.has_state():
+            self.dial_state.backfill_from_history()
+            
+        return self.dial_state.get_many(numbers)
+
+    def can_call_number(self, number, history=None):
         """
         Enforce rules:
         1. Max 3 calls per day
         2. Min 4 hours interval between calls
-        """
-        today_start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
         
-        # Filter for this number, this instance, and dialer actions
-        query = {
-            "instance_full_id": self.instance_full_id,
-            "action": "dialer_trigger",
-            "details.number": number,
-            "occurred_at": {"$gte": today_start}
-        }
+        `history` is this number's entry from load_dial_history(); when omitted it
+        is queried for this single number.
+        """
+        if history is None:
+            history = self.load_dial_history([number]).get(number, {})
         
         # 1. Check Max Calls per Day
-        count_today = self.db.history_action_log.count_documents(query)
+        count_today = history.get('count_today', 0)
         if count_today >= self.dial_per_day:
             logger.debug(f"Blocked {number}: Max {self.dial_per_day} calls reached for today.")
             return False
             
         # 2. Check Interval (4h)
-        # Get the most recent call (not just today, but generally? 
-        # User constraint: 'at last 4 hours of interval'. 
-        # Usually implies 4h from ANY last call.
-        # But if we only check today, the first call of day might be < 4h from yesterday's last call.
-        # Strict interpretation: check global last call.
-        
-        last_call = self.db.history_action_log.find_one(
-            {
-                "instance_full_id": self.instance_full_id,
-                "action": "dialer_trigger",
-                "details.number": number
-            },
-            sort=[("occurred_at", -1)]
-        )
-        
-        if last_call:
-            last_time = last_call.get('occurred_at')
-            if last_time:
-                diff = datetime.now() - last_time
-                if diff < timedelta(hours=self.dial_interval):
-                    logger.debug(f"Blocked {number}: Last call was {diff} ago (<{self.dial_interval}h).")
-                    return False
+        # Measured from the last call on ANY day, so the first call of the day
+        # still respects the interval after yesterday's last call.
+        last_time = history.get('last_call')
+        if last_time:
+            diff = datetime.now() - last_time
+            if diff < timedelta(hours=self.dial_interval):
+                logger.debug(f"Blocked {number}: Last call was {diff} ago (<{self.dial_interval}h).")
+                return False
         
         return True
 
-    def build_queue(self, bills):
+    def _select_calls(self, candidates):
+        """
+        Picks the first eligible number of each candidate client, keeping the
+        candidates' order. Candidates are (client_id, max_expired_age,
+        total_value, client_name, bill_ids, numbers) tuples.
+        """
+        # One round trip for the dial history of every candidate number
+        dial_history = self.load_dial_history({n for c in candidates for n in c[5]})
+        potential_calls = []
+        
+        for cid, max_expired_age, total_value, client_name, bill_ids, unique_numbers in candidates:
+            # One queue item per client: its bills are covered by a single call,
+            # so the queue never holds two entries with the same full_id
+            added_for_client = False
+            for number in unique_numbers:
+                if added_for_client:
+                    break # Take only first valid number to avoid "same full_id" in queue
+                
+                if self.can_call_number(number, dial_history.get(number, {})):
+                    potential_calls.append({
+                        "client_id": cid,
+                        "expired_age": max_expired_age,
+                        "contact": number,
+                        "client_name": client_name,
+                        "total_value": total_value,
+                        "bill_ids": bill_ids
+                    })
+                    added_for_client = True
+                else:
+                    logger.debug(f"Number {number} for Client {cid} is blocked (rules)")
+            
+        return potential_calls
+
+    def build_queue(self, bills, limit=None):
+        """
+        Picks one eligible number per client with bills past `minimum_days_to_charge`,
+        most overdue first. Returns (queue, eligible_bill_count); the queue holds at
+        most `limit` calls (default: `asterisk.num_channel_available`).
+        """
         if not self.check_window():
             logger.info("Outside call window. Skipping queue build.")
             return [], 0
@@ -90,12 +148,9 @@ class Dialer:
             if cid not in client_map:
                 client_map[cid] = []
             client_map[cid].append(bill)
-            
-        call_queue = []
         
-        # We need to sort by expired_age BEFORE limiting
-        # To do that properly, let's first prepare the potential calls list
-        potential_calls = []
+        # First pass: summarize each client and collect its candidate numbers
+        candidates = []
 
         for cid, client_bills in client_map.items():
             sample = client_bills[0]
@@ -104,62 +159,152 @@ class Dialer:
             client_name = sample.get('razao') or sample.get('fantasia')
             bill_ids = [b.get('full_id') for b in client_bills if b.get('full_id')]
             
-            # Extract numbers
-            raw_numbers = [
-                sample.get('telefone_celular'),
-                sample.get('telefone_comercial'),
-                sample.get('whatsapp')
-            ]
+            # Normalized at merge time (dial_numbers); parsed here only for older documents
+            unique_numbers = dialable_numbers(sample)
             
-            # Sanitization & Deduplication
-            unique_numbers = set()
-            for num in raw_numbers:
-                if num:
-                    cleaned = re.sub(r'\D', '', str(num))
-                    if len(cleaned) >= 8:
-                        unique_numbers.add(cleaned)
-            
-            # For each client, we might have multiple numbers. 
-            # But "never can keep two elements with same full_id" 
-            # If we add multiple numbers for SAME client with SAME bills, they share same full_id?
-            # Actually, full_id is per bill. 
-            # If we add two items to queue for same client (different numbers), 
-            # they will BOTH have the same `bill_ids` list.
-            # User says: "in queue never can keep two elements with same full_id"
-            # This implies if we queue a client, we pick ONE number if multiple are available?
-            # Or if we pick multiple numbers, they must be distinct entries, 
-            # but then they share the same bills.
-            # Let's interpret "never keep two elements with same full_id" as:
-            # "No two queue items should represent the same set of bills".
-            # Which effectively means one queue item per client (or per unique bill set).
-            
-            added_for_client = False
-            for number in unique_numbers:
-                if added_for_client:
-                    break # Take only first valid number to avoid "same full_id" in queue
-                
-                if self.can_call_number(number):
-                    potential_calls.append({
-                        "client_id": cid,
-                        "expired_age": max_expired_age,
-                        "contact": number,
-                        "client_name": client_name,
-                        "total_value": total_value,
-                        "bill_ids": bill_ids
-                    })
-                    added_for_client = True
-                else:
-                    logger.debug(f"Number {number} for Client {cid} is blocked (rules)")
+            candidates.append((cid, max_expired_age, total_value, client_name, bill_ids, unique_numbers))
+        
+        # Second pass: pick the first eligible number per client (one history lookup)
+        potential_calls = self._select_calls(candidates)
             
         # Sort by expired_age descending
         potential_calls.sort(key=lambda x: x['expired_age'], reverse=True)
 
         # Limit by num_channel_available
-        limit = self.pabx.get('num_channel_available', 10)
+        if limit is None:
+            limit = self.pabx.get('num_channel_available', 10)
         call_queue = potential_calls[:limit]
             
         return call_queue, eligible_count
 
+    def build_queue_from_index(self, limit=None):
+        """
+        Same contract as build_queue(), reading the persistent priority index
+        ('dialer_priority', refreshed by the bills sync) best score first and
+        stopping once `limit` clients have an eligible number.
+        Returns (None, 0) when the index was never built for this instance.
+        """
+        if not self.check_window():
+            logger.info("Outside call window. Skipping queue build.")
+            return [], 0
+
+        summary = self.priority.summary()
+        if summary is None:
+            return None, 0
+
+        ranked = self.priority.iter_ranked(batch_size=max((limit or 10) * 2, 50))
+        return self._take_eligible(ranked, limit), summary.get('bills', 0)
+
+    def build_queue_from_db(self, limit=None):
+        """
+        Same contract as build_queue(), with the filtering, grouping and
+        projection done by a Mongo aggregation (candidate_pipeline) instead of
+        loading every expired bill. Clients come most overdue first.
+        """
+        if not self.check_window():
+            logger.info("Outside call window. Skipping queue build.")
+            return [], 0
+
+        pipeline = candidate_pipeline(self.instance_full_id, self.min_days)
+        pipeline.append({"$sort": {"max_expired_age": -1}})
+        groups = list(self.db.bills.aggregate(pipeline, allowDiskUse=True))
+        eligible_count = sum(g["bill_count"] for g in groups)
+
+        return self._take_eligible((group_to_candidate(g) for g in groups), limit), eligible_count
+
+    def _take_eligible(self, candidates, limit=None):
+        """
+        Walks ranked candidates in chunks (one dial history lookup per chunk)
+        until `limit` clients have an eligible number.
+        """
+        if limit is None:
+            limit = self.pabx.get('num_channel_available', 10)
+        chunk_size = max(limit * 2, 50)
+
+        call_queue = []
+        chunk = []
+        for candidate in candidates:
+            chunk.append(candidate)
+            if len(chunk) >= chunk_size:
+                call_queue.extend(self._select_calls(chunk))
+                chunk = []
+                if len(call_queue) >= limit:
+                    break
+        if chunk and len(call_queue) < limit:
+            call_queue.extend(self._select_calls(chunk))
+
+        return call_queue[:limit]
+
+    def paced_limit(self):
+        """
+        Queue size for a batch run: `num_channel_available` when pacing is off,
+        otherwise the channels times the pacing ratio, capped by `max_calls_per_trunk`.
+        """
+        channels = int(self.pabx.get('num_channel_available', 10))
+        if not self.pacing.enabled:
+            return channels
+        return self.pacing.launch_limit(channels, cap=self.pabx.get('max_calls_per_trunk'))
+
+    def live_trunk_channels(self):
+        """Live channels on this instance's trunk (ours and any other call), from ARI `GET /channels`."""
+        host = self.pabx.get('host', '127.0.0.1')
+        port = self.pabx.get('port', '8088')
+        url = f"{self.pabx.get('schema', 'http')}://{host}:{port}/ari/channels"
+        with OutboundGovernor().slot(host_key(host, port), self.instance_full_id):
+            resp = requests.get(url, auth=(self.pabx.get('username', 'admin'), self.pabx.get('password', 'admin')), timeout=5)
+        resp.raise_for_status()
+        # Asterisk names trunk channels "<tech>/<trunk>-<sequence>"
+        prefix = f"{self.pabx.get('channel_type', 'SIP')}/{self.pabx.get('channel', 'trunk')}-"
+        return [c for c in resp.json() if (c.get('name') or '').startswith(prefix)]
+
+    def originate_queue(self, queue):
+        """
+        Originates every call in `queue` concurrently, up to
+        `asterisk.num_channel_available` at once. With
+        `asterisk.max_calls_per_trunk`, the live channels on the trunk are
+        counted first (any instance or call using it) and only the free ones
+        are used; the rest of the queue is returned as skipped. A channel
+        frees its place when the call ends, not when the originate returns.
+        Returns one result per call: {"call", "ok", "status", "elapsed"}.
+        """
+        if not queue:
+            return []
+
+        channels = max(int(self.pabx.get('num_channel_available', 10)), 1)
+        trunk_cap = self.pabx.get('max_calls_per_trunk')
+        trunk_key = f"{self.pabx.get('host')}/{self.pabx.get('channel_type', 'SIP')}/{self.pabx.get('channel', 'trunk')}"
+
+        def _originate(call):
+            # Calls not started yet are dropped once shutdown was requested
+            if shutdown_requested():
+                return {"call": call, "ok": False, "status": "skipped", "elapsed": 0.0}
+            start = time.monotonic()
+            ok = self.trigger_call(call)
+            elapsed = round(time.monotonic() - start, 3)
+            return {"call": call, "ok": ok, "status": "success" if ok else "failed", "elapsed": elapsed}
+
+        deferred = []
+        with _get_trunk_lock(trunk_key) if trunk_cap is not None else nullcontext():
+            if trunk_cap is not None:
+                try:
+                    occupied = len(self.live_trunk_channels())
+                except Exception as e:
+                    # Fail closed: an unknown occupancy must not oversubscribe the capped trunk
+                    logger.warning(f"Could not count live channels on {trunk_key}, skipping {len(queue)} calls: {e}")
+                    occupied = int(trunk_cap)
+                free = max(int(trunk_cap) - occupied, 0)
+                if free < len(queue):
+                    logger.info(f"Trunk {trunk_key}: {occupied}/{trunk_cap} channels in use, originating {free} of {len(queue)} calls")
+                    queue, deferred = queue[:free], queue[free:]
+
+            results = []
+            if queue:
+                workers = min(len(queue), channels)
+                with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="dialer") as pool:
+                    results = list(pool.map(_originate, queue))
+
+        return results + [{"call": call, "ok": False, "status": "skipped", "elapsed": 0.0} for call in deferred]
+
     def trigger_call(self, call_data):
         logger.info(f"Triggering call for {call_data}")
         number = call_data['contact']
@@ -208,12 +353,13 @@ class Dialer:
         try:
             logger.info(f"Dialing {number} for Client {client_id} via {url}...")
             # Node-RED uses x-www-form-urlencoded
-            resp = requests.post(
-                url, 
-                data=payload,  # data= sends form-urlencoded
-                auth=(user, password),
-                timeout=5
-            )
+            with OutboundGovernor().slot(host_key(host, port), self.instance_full_id):
+                resp = requests.post(
+                    url, 
+                    data=payload,  # data= sends form-urlencoded
+                    auth=(user, password),
+                    timeout=5
+                )
             resp.raise_for_status()
             
             # Parse Response
@@ -236,30 +382,32 @@ class Dialer:
             r_name = resp_data.get("name")
             r_full_id = resp_data.get("caller", {}).get("name")
             
+            # Per-call accounting for the caller (uniqueid links the later CDR)
+            call_data['uniqueid'] = r_id
+            call_data['channel'] = r_name
+            
             # The requirement says "persist these mapped values into the last_reports collection".
             # Also later "Change persistence logic ... to upsert ... uniqueid as key".
             # ReportService does this for CDRs. Dialer response acts as "pre-CDR" or "live channel info"?
-            # We will follow instruction: "Persist these mapped values into the last_reports collection."
-            
-            if r_id:
-                mapped_doc = {
-                    "uniqueid": r_id,
-                    "channel": r_name,
-                    "full_id": r_full_id, # This effectively links channel to bill/client
-                    "instance_full_id": self.instance_full_id, # Good for partitioning
-                    "triggered_at": datetime.now(),
-                    "source": "dialer_trigger"
-                }
-                
-                self.db.last_reports.update_one(
-                    {"uniqueid": r_id},
-                    {"$set": mapped_doc},
-                    upsert=True
-                )
-                logger.debug(f"Persisted dialer response to last_reports for uniqueid {r_id}")
+            # Persisted by record_trigger(): dial_state attempt right away, the rest in bulk (DialerOutcomeBuffer).
+            call_data['caller_full_id'] = r_full_id
+            call_data['triggered_at'] = datetime.now()
             
             return True
             
         except Exception as e:
             logger.error(f"Failed to trigger call {number}: {e}")
             return False
+
+    def record_trigger(self, call):
+        """
+        Counts the attempt in dial_state immediately (the next eligibility
+        check must see it) and buffers the other writes of a triggered call
+        (last_reports channel, bills call_history, action log); see flush_outcomes().
+        """
+        self.dial_state.record_attempt(call['contact'], call.get('triggered_at'))
+        self.outcomes.add(call)
+
+    def flush_outcomes(self):
+        """Writes the buffered call outcomes; raises DialerFlushError if part of them was lost."""
+        return self.outcomes.flush()
@@ -0,0 +1,118 @@
+import threading
+from datetime import datetime
+from loguru import logger
+from pymongo import InsertOne, UpdateMany, UpdateOne
+from database import Database
+
+class DialerFlushError(Exception):
+    """Raised by DialerOutcomeBuffer.flush() when a collection's bulk write failed."""
+
+class DialerOutcomeBuffer:
+    """
+    Buffers the writes of triggered calls and flushes them as one unordered
+    bulk write per collection:
+
+    - last_reports: the ARI channel of the call (keyed by uniqueid)
+    - bills: one `call_history` entry pushed to all bills of the call
+    - history_action_log: one `dialer_trigger` document per call, with
+      `full_id` holding the array of bill ids (equality queries on a single
+      full_id still match)
+
+    The dial_state attempt is not buffered: Dialer.record_trigger() writes it
+    right away, so eligibility checks never see a stale counter.
+
+    Flushes automatically every `flush_every` calls; callers must flush()
+    at the end of a run.
+    """
+
+    def __init__(self, instance_full_id, flush_every=50):
+        self.db = Database().get_db()
+        self.instance_full_id = instance_full_id
+        self.flush_every = max(int(flush_every), 1)
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.ops = {"last_reports": [], "bills": [], "history_action_log": []}
+        self.calls = 0
+
+    def add(self, call):
+        occurred_at = call.get('triggered_at') or datetime.now()
+        number = call['contact']
+        bill_ids = call.get('bill_ids', [])
+        uniqueid = call.get('uniqueid')
+
+        with self._lock:
+            self.calls += 1
+
+            if uniqueid:
+                self.ops["last_reports"].append(UpdateOne(
+                    {"uniqueid": uniqueid},
+                    {"$set": {
+                        "uniqueid": uniqueid,
+                        "channel": call.get('channel'),
+                        "number": number, # Lets the CDR for this uniqueid update dial_state
+                        "full_id": call.get('caller_full_id'), # This effectively links channel to bill/client
+                        "instance_full_id": self.instance_full_id,
+                        "triggered_at": occurred_at,
+                        "source": "dialer_trigger"
+                    }},
+                    upsert=True
+                ))
+
+            if bill_ids:
+                self.ops["bills"].append(UpdateMany(
+                    {"full_id": {"$in": bill_ids}},
+                    {"$push": {"call_history": {
+                        "occurred_at": occurred_at,
+                        "number": number,
+                        "uniqueid": uniqueid,
+                        "status": "triggered"
+                    }}}
+                ))
+                self.ops["history_action_log"].append(InsertOne({
+                    "full_id": bill_ids,
+                    "action": "dialer_trigger",
+                    "occurred_at": occurred_at,
+                    "instance_full_id": self.instance_full_id,
+                    "details": {
+                        "number": number,
+                        "uniqueid": uniqueid,
+                        "client_name": call.get('client_name'),
+                        "bill_count": len(bill_ids),
+                        "status": "success"
+                    }
+                }))
+
+            due = self.calls >= self.flush_every
+
+        if due:
+            self.flush()
+
+    def flush(self):
+        """
+        Writes everything buffered; returns the number of calls flushed.
+        Raises DialerFlushError (after trying every collection) if a write failed.
+        """
+        with self._lock:
+            ops, calls = self.ops, self.calls
+            self._reset()
+
+        if not calls:
+            return 0
+
+        errors = []
+        for collection, collection_ops in ops.items():
+            if not collection_ops:
+                continue
+            try:
+                self.db[collection].bulk_write(collection_ops, ordered=False)
+            except Exception as e:
+                logger.error(f"Failed to flush {len(collection_ops)} dialer writes to '{collection}': {e}")
+                errors.append(f"{collection}: {e}")
+
+        if errors:
+            raise DialerFlushError(f"Outcomes of {calls} calls not fully written ({'; '.join(errors)})")
+
+        logger.debug(f"Flushed outcomes of {calls} calls for {self.instance_full_id}")
+        return calls
@@ -0,0 +1,161 @@
+import itertools
+import json
+import queue
+import random
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+from loguru import logger
+
+class FakeAri:
+    """
+    Local ARI stand-in for running the dialer without a PBX.
+
+    Serves `POST /ari/channels` (origination) and `GET /ari/channels` over
+    HTTP on 127.0.0.1, and emits synthetic ChannelCreated/StasisStart events on
+    origination, ChannelStateChange (Up) for the `answer_rate` share of calls
+    after a random ring time and ChannelDestroyed when the call ends. Exposes the
+    same `events()` / `sync_channels()` interface as AriEventStream, so it can
+    be passed to ContinuousDialer directly. Point the instance at it with
+    `instance['asterisk'].update(fake.pabx_overrides)`.
+    """
+
+    def __init__(self, call_seconds=(5, 40), latency=0.0, failure_rate=0.0, answer_rate=1.0,
+                 ring_seconds=(1, 8), host="127.0.0.1", port=0):
+        self.call_seconds = call_seconds
+        self.answer_rate = answer_rate
+        self.ring_seconds = ring_seconds
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.reconnected = False
+        self.channels = {}
+        self.originated = 0
+        self._lock = threading.Lock()
+        self._events = queue.Queue()
+        self._seq = itertools.count(1)
+        self.server = ThreadingHTTPServer((host, port), self._make_handler())
+        self.server.daemon_threads = True
+        self.host, self.port = self.server.server_address[:2]
+        self._thread = threading.Thread(target=self.server.serve_forever, name="fake-ari", daemon=True)
+
+    @property
+    def pabx_overrides(self):
+        return {"host": self.host, "port": self.port, "schema": "http"}
+
+    def start(self):
+        self._thread.start()
+        logger.info(f"Fake ARI listening on {self.host}:{self.port}")
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def originate(self, form):
+        """Handles an origination request; returns (http_status, body)."""
+        if self.latency:
+            time.sleep(self.latency)
+        if random.random() < self.failure_rate:
+            return 503, {"message": "Allocation failed"}
+
+        seq = next(self._seq)
+        # "SIP/trunk/5511999999999" -> channel "SIP/trunk-0000002a"
+        endpoint = form.get("endpoint", "SIP/trunk/0")
+        tech_trunk, _, number = endpoint.rpartition("/")
+        caller_name = form.get("callerId", "").split(" <", 1)[0]
+        channel = {
+            "id": f"{time.time():.0f}.{seq}",
+            "name": f"{tech_trunk}-{seq:08x}",
+            "state": "Down",
+            "caller": {"name": caller_name, "number": caller_name},
+            "connected": {"name": "", "number": number},
+            "dialplan": {"context": form.get("context"), "exten": form.get("extension"), "priority": 1},
+            "creationtime": datetime.now().isoformat()
+        }
+        with self._lock:
+            self.channels[channel["id"]] = channel
+            self.originated += 1
+
+        self._emit("ChannelCreated", channel)
+        self._emit("StasisStart", channel)
+
+        ring = random.uniform(*self.ring_seconds)
+        if random.random() < self.answer_rate:
+            self._later(ring, self._answer, channel["id"])
+            self._later(ring + random.uniform(*self.call_seconds), self._hangup, channel["id"])
+        else:
+            self._later(ring, self._hangup, channel["id"])
+        return 200, channel
+
+    @staticmethod
+    def _later(seconds, fn, *args):
+        timer = threading.Timer(seconds, fn, args=args)
+        timer.daemon = True
+        timer.start()
+
+    def _answer(self, channel_id):
+        with self._lock:
+            channel = self.channels.get(channel_id)
+            if channel:
+                channel["state"] = "Up"
+                channel = dict(channel)
+        if channel:
+            self._emit("ChannelStateChange", channel)
+
+    def _hangup(self, channel_id):
+        with self._lock:
+            channel = self.channels.pop(channel_id, None)
+        if channel:
+            self._emit("ChannelDestroyed", channel, cause=16, cause_txt="Normal Clearing")
+
+    def _emit(self, event_type, channel, **extra):
+        event = {
+            "type": event_type,
+            "timestamp": datetime.now().isoformat(),
+            "application": "debt-collector",
+            "channel": dict(channel)
+        }
+        event.update(extra)
+        self._events.put(event)
+
+    def events(self, stop_event, idle_timeout=1.0):
+        while not stop_event.is_set():
+            try:
+                yield self._events.get(timeout=idle_timeout)
+            except queue.Empty:
+                yield None
+
+    def sync_channels(self):
+        with self._lock:
+            return [dict(c) for c in self.channels.values()]
+
+    def _make_handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                if self.path.split("?", 1)[0] != "/ari/channels":
+                    return self._reply(404, {"message": "Resource not found"})
+                length = int(self.headers.get("Content-Length", 0))
+                form = {k: v[0] for k, v in parse_qs(self.rfile.read(length).decode()).items()}
+                self._reply(*fake.originate(form))
+
+            def do_GET(self):
+                if self.path.split("?", 1)[0] != "/ari/channels":
+                    return self._reply(404, {"message": "Resource not found"})
+                self._reply(200, fake.sync_channels())
+
+            def _reply(self, status, body):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                logger.debug(f"Fake ARI: {format % args}")
+
+        return Handler
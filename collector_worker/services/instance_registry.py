@@ -0,0 +1,93 @@
+import copy
+import threading
+from loguru import logger
+from pymongo.errors import OperationFailure, PyMongoError
+from database import Database
+from utils.instance_utils import get_instance_full_id
+
+class InstanceRegistry:
+    """
+    In-process cache of active instance configs.
+
+    Configs are loaded once and served with derived fields precomputed
+    (`instance_full_id`, and `erp`/`asterisk`/`charger` sections always
+    present as dicts). `start_watching()` keeps the cache fresh through a
+    change stream on 'instance_config', falling back to periodic reloads on
+    a standalone mongod where change streams are unavailable.
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(InstanceRegistry, cls).__new__(cls)
+            cls._instance.db = Database().get_db()
+            cls._instance._lock = threading.Lock()
+            cls._instance._configs = None
+            cls._instance._watcher = None
+            cls._instance._stop = threading.Event()
+        return cls._instance
+
+    @staticmethod
+    def _prepare(doc):
+        for section in ("erp", "asterisk", "charger"):
+            if not isinstance(doc.get(section), dict):
+                doc[section] = {}
+        doc["instance_full_id"] = get_instance_full_id(doc)
+        return doc
+
+    def reload(self):
+        docs = [self._prepare(d) for d in self.db.instance_config.find({"status.active": True})]
+        with self._lock:
+            self._configs = docs
+        logger.debug(f"Instance registry loaded {len(docs)} active instances")
+        return len(docs)
+
+    def get_active_instances(self):
+        """Copies of the cached configs; callers may mutate them freely (e.g. debug_calls)."""
+        with self._lock:
+            configs = self._configs
+        if configs is None:
+            self.reload()
+            with self._lock:
+                configs = self._configs
+        return copy.deepcopy(configs)
+
+    def get(self, instance_full_id):
+        for config in self.get_active_instances():
+            if config["instance_full_id"] == instance_full_id:
+                return config
+        return None
+
+    def start_watching(self, poll_seconds=30):
+        if self._watcher and self._watcher.is_alive():
+            return
+        self._watcher = threading.Thread(target=self._watch, args=(poll_seconds,), name="instance-registry", daemon=True)
+        self._watcher.start()
+
+    def stop_watching(self):
+        self._stop.set()
+
+    def _watch(self, poll_seconds):
+        try:
+            with self.db.instance_config.watch() as stream:
+                logger.info("Instance registry watching 'instance_config' change stream")
+                # Reload after the stream is open so no edit between load and watch is missed
+                self.reload()
+                while not self._stop.is_set():
+                    change = stream.try_next()
+                    if change is None:
+                        self._stop.wait(1)
+                        continue
+                    logger.info(f"Instance config changed ({change.get('operationType')}). Reloading registry.")
+                    self.reload()
+            return
+        except OperationFailure as e:
+            logger.info(f"Change streams unavailable ({e.code}). Polling 'instance_config' every {poll_seconds}s.")
+        except PyMongoError as e:
+            logger.warning(f"Instance registry change stream failed: {e}. Falling back to polling.")
+
+        while not self._stop.wait(poll_seconds):
+            try:
+                self.reload()
+            except PyMongoError as e:
+                logger.error(f"Instance registry reload failed: {e}")
@@ -4,6 +4,9 @@ import base64
 import json
 from loguru import logger
 from datetime import datetime, timedelta
+from services.outbound_governor import OutboundGovernor, host_key
+from utils.instance_utils import get_instance_full_id
+from utils.shutdown import check_shutdown, shutdown_requested
 
 class IxcClient:
     def __init__(self, instance_config):
@@ -14,6 +17,8 @@ class IxcClient:
         self.user_id = self.auth.get('user_id')
         self.token = self.auth.get('user_token')
         self.default_page_size = self.erp.get('request_param', {}).get('default_page_size', 20)
+        self.instance_full_id = get_instance_full_id(instance_config)
+        self.host = host_key(self.base_url) if self.base_url else None
         
         self.last_request_time = 0
         self.min_delay = 0.1  # 100ms
@@ -34,12 +39,33 @@ class IxcClient:
             time.sleep(self.min_delay - elapsed)
         self.last_request_time = time.time()
 
-    def fetch_all(self, endpoint, query_params):
+    def fetch_all(self, endpoint, query_params, checkpoint=None):
         all_records = []
         page = 1
         total_records = None
         
+        # Resume from records spilled by an interrupted run
+        if checkpoint:
+            all_records, last_page, total_records = checkpoint.load_pages(endpoint)
+            if checkpoint.is_fetched(endpoint):
+                if all_records:
+                    logger.info(f"Using {len(all_records)} {endpoint} records from checkpoint")
+                    checkpoint.mark_fetched(endpoint, all_records, total=total_records)
+                    return all_records
+                logger.info(f"{endpoint} records of the interrupted run were not spilled, fetching again")
+                checkpoint.restart_fetch(endpoint)
+                last_page = 0
+            if last_page:
+                logger.info(f"Resuming {endpoint} fetch at page {last_page + 1} ({len(all_records)} records from checkpoint)")
+            page = last_page + 1
+        
         while True:
+            # Stop between pages; spilled records let the next start continue from here
+            if checkpoint and shutdown_requested():
+                checkpoint.hold(endpoint, all_records, page - 1, total_records)
+                checkpoint.spill()
+            check_shutdown()
+            
             query_params['page'] = str(page)
             if 'rp' not in query_params:
                 query_params['rp'] = str(self.default_page_size)
@@ -50,7 +76,8 @@ class IxcClient:
             logger.info(f"Fetching {endpoint} page {page}...")
             
             try:
-                response = requests.post(url, headers=self._get_headers(), json=query_params)
+                with OutboundGovernor().slot(self.host, self.instance_full_id):
+                    response = requests.post(url, headers=self._get_headers(), json=query_params)
                 response.raise_for_status()
                 data = response.json()
                 
@@ -72,11 +99,15 @@ class IxcClient:
                 
             except Exception as e:
                 logger.error(f"Error fetching page {page}: {e}")
-                break
+                # A partial fetch must not be reused as complete on resume
+                return all_records
+        
+        if checkpoint:
+            checkpoint.mark_fetched(endpoint, all_records, total=total_records)
                 
         return all_records
 
-    def get_clients(self):
+    def get_clients(self, checkpoint=None):
         # topic === "update_clients" logic
         query_params = {
             "qtype": "cliente.ativo",
@@ -90,9 +121,9 @@ class IxcClient:
                 {"TB": "cliente.filial_id", "OP": "!=", "P": "3"}
             ])
         }
-        return self.fetch_all("cliente", query_params)
+        return self.fetch_all("cliente", query_params, checkpoint=checkpoint)
 
-    def get_bills(self):
+    def get_bills(self, checkpoint=None):
         # topic === "update_bills" logic
         today = datetime.now()
         future_date = today
@@ -113,7 +144,7 @@ class IxcClient:
                 {"TB": "fn_areceber.data_vencimento", "OP": ">", "P": format_date(past_date)}
             ])
         }
-        return self.fetch_all("fn_areceber", query_params)
+        return self.fetch_all("fn_areceber", query_params, checkpoint=checkpoint)
     
     def get_blocked_contracts(self):
         query_params = {
@@ -0,0 +1,298 @@
+import os
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+from loguru import logger
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from database import Database
+from utils.instance_utils import get_instance_full_id
+from utils.shutdown import ShutdownRequested, shutdown_requested
+
+class JobQueue:
+    """
+    Persistent work queue backed by the 'job_queue' collection.
+
+    Each document is one job for one instance (`instance_full_id=None` means
+    all active instances). The `slot` field is "pending" or "running" while
+    the job is live and removed once it finishes; a unique partial index on
+    (job, instance_full_id, slot) keeps at most one pending and one running
+    copy of the same job, so repeated triggers collapse and the same job never
+    runs twice in parallel for an instance.
+
+    The frontend does not write queue documents itself: it inserts a
+    'job_requests' entry ({job, instance_id}) that consumers turn into a job
+    with accept_requests(), and checks 'job_consumers' heartbeats to know
+    whether anything will run it.
+    """
+
+    JOBS = ["clients", "bills", "dialer", "reports", "metrics", "client_types", "blocked_contracts"]
+
+    def __init__(self, lease_seconds=1800):
+        self.db = Database().get_db()
+        self.collection = self.db.job_queue
+        self.lease_seconds = lease_seconds
+
+    def enqueue(self, job, instance_full_id=None, source="scheduler", priority=0, delay_seconds=0):
+        """
+        Adds a job unless an identical one is already pending.
+        With `delay_seconds`, a pending copy is moved to the new time instead.
+        Returns True if a new document was created.
+        """
+        if job not in self.JOBS:
+            raise ValueError(f"Unknown job '{job}'")
+
+        now = datetime.now()
+        update = {
+            "$setOnInsert": {
+                "job": job,
+                "instance_full_id": instance_full_id,
+                "status": "pending",
+                "slot": "pending",
+                "source": source,
+                "priority": priority,
+                "enqueued_at": now,
+                "attempts": 0
+            }
+        }
+        available_at = now + timedelta(seconds=delay_seconds)
+        if delay_seconds:
+            update["$set"] = {"available_at": available_at}
+        else:
+            update["$setOnInsert"]["available_at"] = available_at
+
+        try:
+            res = self.collection.update_one(
+                {"job": job, "instance_full_id": instance_full_id, "slot": "pending"},
+                update,
+                upsert=True
+            )
+        except DuplicateKeyError:
+            # Lost an upsert race against another producer; the job is queued either way
+            return False
+
+        created = res.upserted_id is not None
+        if created:
+            logger.debug(f"Enqueued '{job}' for {instance_full_id or 'all instances'} (source: {source})")
+        return created
+
+    def accept_requests(self):
+        """Enqueues the jobs requested from the frontend ('job_requests'); returns how many were taken."""
+        taken = 0
+        while True:
+            request = self.db.job_requests.find_one_and_delete({}, sort=[("requested_at", 1)])
+            if request is None:
+                return taken
+            taken += 1
+            instance = self.db.instance_config.find_one({"_id": request.get("instance_id")}, {"instance_name": 1, "erp.type": 1})
+            if instance is None or request.get("job") not in self.JOBS:
+                logger.warning(f"Dropping job request {request.get('job')} for unknown instance {request.get('instance_id')}")
+                continue
+            self.enqueue(request["job"], get_instance_full_id(instance), source="frontend", priority=10)
+
+    def heartbeat(self, consumer_id, workers):
+        """Tells the frontend a consumer is alive ('job_consumers')."""
+        self.db.job_consumers.update_one(
+            {"_id": consumer_id},
+            {"$set": {"workers": workers, "heartbeat_at": datetime.now()}},
+            upsert=True
+        )
+
+    def remove_consumer(self, consumer_id):
+        self.db.job_consumers.delete_one({"_id": consumer_id})
+
+    def claim(self, worker_id):
+        """Atomically takes the next available job (or one whose lease expired)."""
+        now = datetime.now()
+        while True:
+            candidate = self.collection.find_one(
+                {"$or": [
+                    {"slot": "pending", "available_at": {"$lte": now}},
+                    {"slot": "running", "lease_until": {"$lt": now}}
+                ]},
+                sort=[("priority", -1), ("available_at", 1)]
+            )
+            if not candidate:
+                return None
+
+            try:
+                return self.collection.find_one_and_update(
+                    {"_id": candidate["_id"], "slot": candidate["slot"], "lease_until": candidate.get("lease_until")},
+                    {
+                        "$set": {
+                            "status": "running",
+                            "slot": "running",
+                            "worker_id": worker_id,
+                            "claimed_at": now,
+                            "lease_until": now + timedelta(seconds=self.lease_seconds)
+                        },
+                        "$inc": {"attempts": 1}
+                    },
+                    return_document=ReturnDocument.AFTER
+                )
+            except DuplicateKeyError:
+                # Same job already running for this instance; retry this one a bit later
+                self.collection.update_one(
+                    {"_id": candidate["_id"], "slot": "pending"},
+                    {"$set": {"available_at": now + timedelta(seconds=30)}}
+                )
+
+    def extend_lease(self, job_id, worker_id):
+        self.collection.update_one(
+            {"_id": job_id, "worker_id": worker_id, "slot": "running"},
+            {"$set": {"lease_until": datetime.now() + timedelta(seconds=self.lease_seconds)}}
+        )
+
+    def requeue(self, job_id, worker_id):
+        """Returns an interrupted job to pending so the next consumer resumes it right away."""
+        try:
+            self.collection.update_one(
+                {"_id": job_id, "worker_id": worker_id, "slot": "running"},
+                {
+                    "$set": {"status": "pending", "slot": "pending", "available_at": datetime.now()},
+                    "$unset": {"lease_until": "", "worker_id": ""}
+                }
+            )
+        except DuplicateKeyError:
+            # A fresh copy is already pending; that one will pick up the checkpoint
+            self.ack(job_id, worker_id, error="interrupted by shutdown")
+
+    def ack(self, job_id, worker_id, stats=None, error=None):
+        """Marks a claimed job as finished (or failed) and stores its stats."""
+        self.collection.update_one(
+            {"_id": job_id, "worker_id": worker_id},
+            {
+                "$set": {
+                    "status": "failed" if error else "done",
+                    "finished_at": datetime.now(),
+                    "stats": stats or {},
+                    "error": error
+                },
+                "$unset": {"slot": "", "lease_until": ""}
+            }
+        )
+
+
+class JobConsumer:
+    """Pool of worker threads that claim jobs from a JobQueue and execute them."""
+
+    # Liveness written to 'job_consumers'; the frontend treats older heartbeats as gone
+    HEARTBEAT_SECONDS = 30
+
+    def __init__(self, queue, handlers, workers=2, poll_interval=5):
+        self.queue = queue
+        self.handlers = handlers
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.consumer_id = f"{socket.gethostname()}-{os.getpid()}"
+        self._stop = threading.Event()
+        self._threads = []
+        self._in_flight = {}  # job _id -> worker_id
+        self._lock = threading.Lock()
+
+    def start(self):
+        for n in range(self.workers):
+            worker_id = f"{self.consumer_id}-w{n}"
+            t = threading.Thread(target=self._work_loop, args=(worker_id,), name=worker_id, daemon=True)
+            t.start()
+            self._threads.append(t)
+
+        hb = threading.Thread(target=self._heartbeat_loop, name=f"{self.consumer_id}-hb", daemon=True)
+        hb.start()
+        self._threads.append(hb)
+        logger.info(f"Job consumer {self.consumer_id} started with {self.workers} workers")
+
+    def stop(self, timeout=None):
+        """Stops claiming new jobs and waits up to `timeout` seconds (overall) for running ones."""
+        self._stop.set()
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        for t in self._threads:
+            t.join(None if deadline is None else max(deadline - time.monotonic(), 0))
+        try:
+            self.queue.remove_consumer(self.consumer_id)
+        except Exception as e:
+            logger.warning(f"Failed to remove consumer heartbeat: {e}")
+
+    def _heartbeat_loop(self):
+        # Renew leases well before they expire so long jobs are not reclaimed
+        lease_interval = max(self.queue.lease_seconds // 3, 1)
+        last_renewal = time.monotonic()
+        while True:
+            try:
+                self.queue.heartbeat(self.consumer_id, self.workers)
+            except Exception as e:
+                logger.warning(f"Failed to write consumer heartbeat: {e}")
+            if self._stop.wait(min(self.HEARTBEAT_SECONDS, lease_interval)):
+                return
+            if time.monotonic() - last_renewal < lease_interval:
+                continue
+            last_renewal = time.monotonic()
+            with self._lock:
+                in_flight = list(self._in_flight.items())
+            for job_id, worker_id in in_flight:
+                try:
+                    self.queue.extend_lease(job_id, worker_id)
+                except Exception as e:
+                    logger.warning(f"Failed to extend lease for job {job_id}: {e}")
+
+    def _work_loop(self, worker_id):
+        while not self._stop.is_set() and not shutdown_requested():
+            try:
+                self.queue.accept_requests()
+                doc = self.queue.claim(worker_id)
+            except Exception as e:
+                logger.error(f"Failed to claim job: {e}")
+                doc = None
+
+            if not doc:
+                self._stop.wait(self.poll_interval)
+                continue
+
+            self._execute(doc, worker_id)
+
+    def _execute(self, doc, worker_id):
+        job = doc["job"]
+        instance_full_id = doc.get("instance_full_id")
+        handler = self.handlers.get(job)
+
+        with self._lock:
+            self._in_flight[doc["_id"]] = worker_id
+
+        start_time = time.time()
+        error = None
+        result = None
+        try:
+            if not handler:
+                raise ValueError(f"No handler for job '{job}'")
+            logger.info(f"[{worker_id}] Running '{job}' for {instance_full_id or 'all instances'}")
+            result = handler([instance_full_id]) if instance_full_id else handler()
+        except ShutdownRequested:
+            logger.warning(f"[{worker_id}] '{job}' stopped at a safe point for shutdown. Requeued.")
+            self.queue.requeue(doc["_id"], worker_id)
+            return
+        except Exception as e:
+            error = str(e)
+            logger.error(f"[{worker_id}] Job '{job}' failed: {e}")
+        finally:
+            with self._lock:
+                self._in_flight.pop(doc["_id"], None)
+
+        stats = {
+            "elapsed_time_seconds": round(time.time() - start_time, 2),
+            "attempts": doc.get("attempts", 1),
+            "queue_wait_seconds": round((doc["claimed_at"] - doc["available_at"]).total_seconds(), 2)
+        }
+        # Handlers return {instance_full_id: count}; a single-instance job stores its own count
+        if isinstance(result, dict) and instance_full_id:
+            result = result.get(instance_full_id)
+        if isinstance(result, dict):
+            # instance_full_id may contain dots, which are not allowed in field names
+            result = [{"instance_full_id": k, "result": v} for k, v in result.items()]
+        if result is not None:
+            stats["result"] = result
+
+        try:
+            self.queue.ack(doc["_id"], worker_id, stats=stats, error=error)
+        except Exception as e:
+            logger.error(f"Failed to ack job {doc['_id']}: {e}")
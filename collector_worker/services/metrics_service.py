@@ -1,15 +1,12 @@
 from datetime import datetime, timedelta
 from loguru import logger
 from database import Database
+from utils.instance_utils import get_instance_full_id
 
 class MetricsService:
     def __init__(self, instance):
         self.instance = instance
-        # Reuse helper logic to get full id
-        name = instance.get('instance_name', 'default')
-        erp_type = instance.get('erp', {}).get('type', 'ixc')
-        oid = str(instance.get('_id', ''))
-        self.instance_full_id = f"{name}-{erp_type}-{oid}"
+        self.instance_full_id = get_instance_full_id(instance)
         self.db = Database().get_db()
 
     # Default Reverse Map (fallback/base) derived from try2.py logic
@@ -195,11 +192,23 @@ class MetricsService:
             # 3. Action Log Metrics (Today's activities)
             today_start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
             
-            triggered_calls = self.db.history_action_log.count_documents({
-                "instance_full_id": self.instance_full_id,
-                "action": "dialer_trigger",
-                "occurred_at": {"$gte": today_start}
-            })
+            # One dialer_trigger document per call, covering `details.bill_count` bills
+            # (documents written before that field existed were one per bill).
+            # dialer_triggers keeps counting bills; dialer_calls counts calls.
+            triggers = list(self.db.history_action_log.aggregate([
+                {"$match": {
+                    "instance_full_id": self.instance_full_id,
+                    "action": "dialer_trigger",
+                    "occurred_at": {"$gte": today_start}
+                }},
+                {"$group": {
+                    "_id": None,
+                    "calls": {"$sum": 1},
+                    "bills": {"$sum": {"$ifNull": ["$details.bill_count", 1]}}
+                }}
+            ]))
+            triggered_calls = triggers[0]["bills"] if triggers else 0
+            triggered_call_count = triggers[0]["calls"] if triggers else 0
 
             # 4. CDR Metrics (from last_reports)
             today_str = datetime.now().strftime("%Y-%m-%d")
@@ -371,7 +380,8 @@ class MetricsService:
                         "bill_stats": bill_stats_result
                     },
                     "actions_today": {
-                        "dialer_triggers": triggered_calls
+                        "dialer_triggers": triggered_calls,
+                        "dialer_calls": triggered_call_count
                     },
                     "cdr_stats": cdr_metrics,
                     "blocked_contracts": blocked_metrics
@@ -386,4 +396,4 @@ class MetricsService:
 
         except Exception as e:
             logger.error(f"Failed to collect metrics for {self.instance_full_id}: {e}")
-            return None
+            raise
@@ -0,0 +1,141 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from urllib.parse import urlparse
+from loguru import logger
+from config import Config
+
+def host_key(url_or_host, port=None):
+    """Normalizes a base URL or host/port pair to the 'host:port' key used by the governor."""
+    if "://" in str(url_or_host):
+        parsed = urlparse(url_or_host)
+        default_port = 443 if parsed.scheme == "https" else 80
+        return f"{parsed.hostname}:{parsed.port or default_port}"
+    return f"{url_or_host}:{port}" if port else str(url_or_host)
+
+class _HostState:
+    def __init__(self, limit):
+        self.limit = limit
+        self.in_flight = 0
+        self.waiters = {}         # instance_full_id -> deque of Events
+        self.turns = deque()      # round-robin order of instances with waiters
+        self.acquired = 0
+        self.waited = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+class OutboundGovernor:
+    """
+    Process-wide cap on in-flight requests per remote host.
+
+    Every outbound call to the ERP, ARI or CDR host takes a slot for that
+    host. When the host is at its ceiling, callers queue per instance and
+    freed slots are handed out round-robin across instances, so one instance's
+    bulk fetch cannot starve the others. Ceilings come from
+    OUTBOUND_MAX_PER_HOST with per-host overrides in OUTBOUND_HOST_LIMITS
+    ("host:port=n,...").
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(OutboundGovernor, cls).__new__(cls)
+            cls._instance._lock = threading.Lock()
+            cls._instance._hosts = {}
+            cls._instance.default_limit = Config.OUTBOUND_MAX_PER_HOST
+            cls._instance.limits = cls._parse_limits(Config.OUTBOUND_HOST_LIMITS)
+        return cls._instance
+
+    @staticmethod
+    def _parse_limits(raw):
+        limits = {}
+        for item in (raw or "").split(","):
+            if "=" not in item:
+                continue
+            host, value = item.rsplit("=", 1)
+            try:
+                limits[host.strip()] = max(int(value), 1)
+            except ValueError:
+                logger.warning(f"Ignoring invalid outbound limit '{item}'")
+        return limits
+
+    def _state(self, host):
+        state = self._hosts.get(host)
+        if state is None:
+            state = _HostState(self.limits.get(host, self.default_limit))
+            self._hosts[host] = state
+        return state
+
+    def acquire(self, host, instance_full_id=None):
+        start = time.monotonic()
+        with self._lock:
+            state = self._state(host)
+            if state.in_flight < state.limit and not state.turns:
+                state.in_flight += 1
+                state.acquired += 1
+                return 0.0
+
+            event = threading.Event()
+            queue = state.waiters.setdefault(instance_full_id, deque())
+            queue.append(event)
+            if instance_full_id not in state.turns:
+                state.turns.append(instance_full_id)
+
+        # Slot is handed over by release() without decrementing in_flight
+        event.wait()
+        waited = time.monotonic() - start
+
+        with self._lock:
+            state.acquired += 1
+            state.waited += 1
+            state.total_wait += waited
+            state.max_wait = max(state.max_wait, waited)
+        return waited
+
+    def release(self, host):
+        with self._lock:
+            state = self._state(host)
+            while state.turns:
+                instance_full_id = state.turns.popleft()
+                queue = state.waiters.get(instance_full_id)
+                if not queue:
+                    continue
+                event = queue.popleft()
+                if queue:
+                    state.turns.append(instance_full_id)
+                else:
+                    del state.waiters[instance_full_id]
+                event.set()
+                return
+            state.in_flight -= 1
+
+    @contextmanager
+    def slot(self, host, instance_full_id=None):
+        self.acquire(host, instance_full_id)
+        try:
+            yield
+        finally:
+            self.release(host)
+
+    def stats(self):
+        with self._lock:
+            return {
+                host: {
+                    "limit": s.limit,
+                    "in_flight": s.in_flight,
+                    "queued": sum(len(q) for q in s.waiters.values()),
+                    "acquired": s.acquired,
+                    "waited": s.waited,
+                    "avg_wait_seconds": round(s.total_wait / s.waited, 3) if s.waited else 0.0,
+                    "max_wait_seconds": round(s.max_wait, 3)
+                }
+                for host, s in self._hosts.items()
+            }
+
+    def log_stats(self):
+        for host, s in self.stats().items():
+            logger.info(
+                f"Outbound {host}: {s['in_flight']}/{s['limit']} in flight, {s['queued']} queued, "
+                f"{s['acquired']} requests, {s['waited']} waited (avg {s['avg_wait_seconds']}s, max {s['max_wait_seconds']}s)"
+            )
@@ -0,0 +1,128 @@
+import math
+import time
+from datetime import datetime, timedelta
+from loguru import logger
+from database import Database
+from utils.instance_utils import get_instance_full_id
+
+class PacingEngine:
+    """
+    Predictive pacing from the instance's own call outcomes.
+
+    Rolling disposition rates (answered, busy, machine, no answer, failed) are
+    aggregated per hour of day from the dialer-originated CDRs in
+    'last_reports' (`NO ANSWER MACHINE` is the ReportService mapping of
+    AMD-detected machines, counted as not connected). The pacing ratio is
+    1 / answer rate, clamped to [1, max_ratio], and tells how many calls to
+    launch per free channel so that the expected connected calls fill the
+    channels. Hours with fewer than `min_samples` calls use the all-hours
+    rate; with too little history overall the ratio is 1 (no over-dialing).
+
+    Configured per instance in `charger.pacing`:
+    {"enabled": false, "window_days": 7, "min_samples": 30, "max_ratio": 2.0, "refresh_minutes": 15}
+    """
+
+    DEFAULTS = {"enabled": False, "window_days": 7, "min_samples": 30, "max_ratio": 2.0, "refresh_minutes": 15}
+
+    DISPOSITION_KEYS = {
+        "ANSWERED": "answered",
+        "BUSY": "busy",
+        "NO ANSWER MACHINE": "machine",
+        "NO ANSWER": "no_answer",
+        "FAILED": "failed"
+    }
+
+    def __init__(self, instance_config):
+        self.db = Database().get_db()
+        self.instance_full_id = get_instance_full_id(instance_config)
+        self.settings = {**self.DEFAULTS, **(instance_config.get('charger', {}).get('pacing') or {})}
+        self.enabled = bool(self.settings["enabled"])
+        self._by_hour = {}
+        self._overall = None
+        self._loaded_at = None
+
+    def refresh(self):
+        """Recomputes the per-hour rates (one aggregation) and publishes them to data_reference."""
+        since = datetime.now() - timedelta(days=self.settings["window_days"])
+        pipeline = [
+            {"$match": {
+                "instance_full_id": self.instance_full_id,
+                "source": "dialer_trigger",
+                "disposition": {"$ne": None},
+                "triggered_at": {"$gte": since}
+            }},
+            {"$group": {
+                "_id": {"hour": {"$hour": "$triggered_at"}, "disposition": "$disposition"},
+                "count": {"$sum": 1}
+            }}
+        ]
+
+        by_hour = {}
+        overall = self._empty()
+        for doc in self.db.last_reports.aggregate(pipeline):
+            key = self.DISPOSITION_KEYS.get(doc["_id"]["disposition"], "failed")
+            hour = doc["_id"]["hour"]
+            by_hour.setdefault(hour, self._empty())
+            for bucket in (by_hour[hour], overall):
+                bucket[key] += doc["count"]
+                bucket["samples"] += doc["count"]
+
+        self._by_hour = by_hour
+        self._overall = overall
+        self._loaded_at = time.monotonic()
+
+        self.db.data_reference.update_one(
+            {"instance_full_id": self.instance_full_id},
+            {"$set": {
+                "instance_full_id": self.instance_full_id,
+                "pacing": {
+                    "overall": self._with_rates(overall),
+                    "by_hour": {str(h): self._with_rates(b) for h, b in sorted(by_hour.items())},
+                    "refreshed_at": datetime.now()
+                }
+            }},
+            upsert=True
+        )
+        logger.debug(f"Pacing rates for {self.instance_full_id}: {self._with_rates(overall)}")
+
+    @classmethod
+    def _empty(cls):
+        bucket = {key: 0 for key in cls.DISPOSITION_KEYS.values()}
+        bucket["samples"] = 0
+        return bucket
+
+    @staticmethod
+    def _with_rates(bucket):
+        samples = bucket["samples"]
+        rates = {f"{k}_rate": round(v / samples, 4) if samples else 0.0 for k, v in bucket.items() if k != "samples"}
+        return {**bucket, **rates}
+
+    def _ensure_loaded(self):
+        stale = self._loaded_at is None or time.monotonic() - self._loaded_at >= self.settings["refresh_minutes"] * 60
+        if stale:
+            self.refresh()
+
+    def rates(self, hour=None):
+        """Disposition counts and rates for `hour` (default: now), falling back to all hours."""
+        self._ensure_loaded()
+        hour = datetime.now().hour if hour is None else hour
+        bucket = self._by_hour.get(hour)
+        if not bucket or bucket["samples"] < self.settings["min_samples"]:
+            bucket = self._overall
+        return self._with_rates(bucket)
+
+    def ratio(self, hour=None):
+        """Calls to launch per free channel (1.0 when pacing is off or history is too short)."""
+        if not self.enabled:
+            return 1.0
+        rates = self.rates(hour)
+        if rates["samples"] < self.settings["min_samples"] or rates["answered_rate"] <= 0:
+            return 1.0
+        return round(min(max(1 / rates["answered_rate"], 1.0), float(self.settings["max_ratio"])), 2)
+
+    def launch_limit(self, free_channels, cap=None):
+        """How many calls to originate for `free_channels` free channels, at most `cap`."""
+        if free_channels <= 0:
+            return 0
+        limit = math.ceil(free_channels * self.ratio())
+        return limit if cap is None else max(min(limit, int(cap)), 0)
@@ -0,0 +1,87 @@
+import threading
+from datetime import datetime, timedelta
+from loguru import logger
+from config import Config
+
+class PbxSessionCache:
+    """
+    Process-wide cache of authenticated Issabel web sessions.
+
+    Keyed by CDR host and user, so every instance reporting from the same
+    PBX reuses one `issabelSession` cookie instead of logging in on each run.
+    Entries live in memory and, with PBX_SESSION_PERSIST, in the
+    'pbx_sessions' collection (TTL on `expires_at`) so one-off job runs and
+    restarts reuse them too. The expiry slides forward on every successful
+    use; a session rejected by the PBX is invalidated by the caller.
+    Expiry times are UTC: MongoDB reads naive datetimes as UTC, and the
+    worker runs with a local TZ.
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(PbxSessionCache, cls).__new__(cls)
+            cls._instance._lock = threading.Lock()
+            cls._instance._sessions = {}
+            cls._instance.ttl = timedelta(minutes=Config.PBX_SESSION_TTL_MINUTES)
+            cls._instance.persist = Config.PBX_SESSION_PERSIST
+        return cls._instance
+
+    @staticmethod
+    def key(host, username):
+        return f"{host}|{username}"
+
+    def _collection(self):
+        from database import Database
+        return Database().get_db().pbx_sessions
+
+    def get(self, key):
+        """Cookies ([{name, value, domain, path}]) of a live session for `key`, or None."""
+        now = datetime.utcnow()
+        with self._lock:
+            entry = self._sessions.get(key)
+        if entry is None and self.persist:
+            try:
+                entry = self._collection().find_one({"_id": key}, {"_id": 0, "cookies": 1, "expires_at": 1})
+            except Exception as e:
+                logger.warning(f"Could not read cached PBX session for {key}: {e}")
+                entry = None
+            if entry:
+                with self._lock:
+                    self._sessions[key] = entry
+        if not entry or entry["expires_at"] <= now:
+            return None
+        return entry["cookies"]
+
+    def put(self, key, cookies):
+        entry = {"cookies": cookies, "expires_at": datetime.utcnow() + self.ttl}
+        with self._lock:
+            self._sessions[key] = entry
+        self._save(key, {**entry, "updated_at": datetime.utcnow()})
+
+    def touch(self, key):
+        """Extends the expiry of a session that was just used successfully."""
+        expires_at = datetime.utcnow() + self.ttl
+        with self._lock:
+            entry = self._sessions.get(key)
+            if entry is None:
+                return
+            entry["expires_at"] = expires_at
+        self._save(key, {"expires_at": expires_at}, upsert=False)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._sessions.pop(key, None)
+        if self.persist:
+            try:
+                self._collection().delete_one({"_id": key})
+            except Exception as e:
+                logger.warning(f"Could not drop cached PBX session for {key}: {e}")
+
+    def _save(self, key, fields, upsert=True):
+        if not self.persist:
+            return
+        try:
+            self._collection().update_one({"_id": key}, {"$set": fields}, upsert=upsert)
+        except Exception as e:
+            logger.warning(f"Could not persist PBX session for {key}: {e}")
@@ -0,0 +1,181 @@
+import math
+from datetime import datetime
+from loguru import logger
+from pymongo import UpdateOne
+from database import Database
+from utils.instance_utils import get_instance_full_id
+from utils.phone_utils import dialable_numbers
+
+def candidate_pipeline(instance_full_id, min_days):
+    """
+    Aggregation shared by the dialer and the priority index: expired bills past
+    `min_days`, grouped per client with the oldest age, summed value, bill ids,
+    bill count and the phone/name fields (precomputed `dial_numbers`, raw
+    fields for bills synced before it existed) of the first bill. Served by the
+    (instance_full_id, vencimento_status, expired_age) index on 'bills'; the
+    unbounded call_history array is never loaded.
+    """
+    return [
+        {"$match": {
+            "instance_full_id": instance_full_id,
+            "vencimento_status": "expired",
+            "expired_age": {"$gte": min_days}
+        }},
+        {"$project": {
+            "_id": 0, "id_cliente": 1, "expired_age": 1, "valor": 1, "full_id": 1,
+            "razao": 1, "fantasia": 1, "dial_numbers": 1,
+            "telefone_celular": 1, "telefone_comercial": 1, "whatsapp": 1
+        }},
+        {"$group": {
+            "_id": "$id_cliente",
+            "max_expired_age": {"$max": "$expired_age"},
+            "total_value": {"$sum": {"$convert": {"input": "$valor", "to": "double", "onError": 0, "onNull": 0}}},
+            "bill_ids": {"$push": "$full_id"},
+            "bill_count": {"$sum": 1},
+            "razao": {"$first": "$razao"},
+            "fantasia": {"$first": "$fantasia"},
+            "dial_numbers": {"$first": "$dial_numbers"},
+            "telefone_celular": {"$first": "$telefone_celular"},
+            "telefone_comercial": {"$first": "$telefone_comercial"},
+            "whatsapp": {"$first": "$whatsapp"}
+        }}
+    ]
+
+def group_to_candidate(group):
+    """Turns a candidate_pipeline() group into the dialer's candidate tuple."""
+    numbers = dialable_numbers(group)
+    bill_ids = [b for b in group.get("bill_ids", []) if b]
+    return (group["_id"], group["max_expired_age"], group["total_value"],
+            group.get('razao') or group.get('fantasia'), bill_ids, numbers)
+
+class DebtorPriorityIndex:
+    """
+    Persistent per-instance ranking of debtors ('dialer_priority').
+
+    One document per client with expired bills past `minimum_days_to_charge`,
+    holding the aggregates the dialer needs (oldest age, total value, bill ids,
+    candidate numbers) and a score from `charger.priority_weights`:
+
+        score = age * max_expired_age
+              + value * log10(1 + total_value)
+              + answer_rate * answered / attempts   (from dial_state)
+
+    The default weights ({"age": 1}) keep the historical "most overdue first"
+    order. The bills sync refreshes the index incrementally (changed clients
+    upserted, dropped clients deleted); the dialer walks it through the
+    (instance_full_id, score) index and stops after K eligible clients.
+    """
+
+    DEFAULT_WEIGHTS = {"age": 1.0, "value": 0.0, "answer_rate": 0.0}
+    # Stored per entry and compared on refresh; unchanged entries are not rewritten
+    ENTRY_FIELDS = ["max_expired_age", "total_value", "answer_rate", "score", "client_name", "bill_ids", "numbers"]
+
+    def __init__(self, instance_config):
+        self.db = Database().get_db()
+        self.instance_full_id = get_instance_full_id(instance_config)
+        charger = instance_config.get('charger', {})
+        self.min_days = charger.get('minimum_days_to_charge', 7)
+        self.weights = {**self.DEFAULT_WEIGHTS, **(charger.get('priority_weights') or {})}
+
+    def score(self, max_expired_age, total_value, answer_rate):
+        w = self.weights
+        return round(
+            w['age'] * max_expired_age
+            + w['value'] * math.log10(1 + max(total_value, 0))
+            + w['answer_rate'] * answer_rate,
+            4
+        )
+
+    def _answer_rates(self, numbers):
+        """Returns {number: (answered_total, attempts_total)} from dial_state."""
+        if not numbers:
+            return {}
+        cursor = self.db.dial_state.find(
+            {"instance_full_id": self.instance_full_id, "number": {"$in": list(numbers)}},
+            {"_id": 0, "number": 1, "answered_total": 1, "attempts_total": 1}
+        )
+        return {d["number"]: (d.get("answered_total", 0), d.get("attempts_total", 0)) for d in cursor}
+
+    def refresh(self):
+        """
+        Brings this instance's entries in line with 'bills': only clients whose
+        entry changed are written, clients without eligible bills are deleted.
+        """
+        refreshed_at = datetime.now()
+        pipeline = candidate_pipeline(self.instance_full_id, self.min_days)
+        groups = list(self.db.bills.aggregate(pipeline, allowDiskUse=True))
+
+        candidates = [group_to_candidate(g) for g in groups]
+        rates = self._answer_rates({n for c in candidates for n in c[5]})
+        existing = {
+            d.pop("client_id"): d
+            for d in self.db.dialer_priority.find(
+                {"instance_full_id": self.instance_full_id},
+                {"_id": 0, "client_id": 1, **{f: 1 for f in self.ENTRY_FIELDS}}
+            )
+        }
+
+        ops = []
+        bill_count = 0
+        for cid, max_expired_age, total_value, client_name, bill_ids, numbers in candidates:
+            answered = sum(rates.get(n, (0, 0))[0] for n in numbers)
+            attempts = sum(rates.get(n, (0, 0))[1] for n in numbers)
+            answer_rate = answered / attempts if attempts else 0.0
+            bill_count += len(bill_ids)
+            entry = {
+                "max_expired_age": max_expired_age,
+                "total_value": round(total_value, 2),
+                "answer_rate": round(answer_rate, 4),
+                "score": self.score(max_expired_age, total_value, answer_rate),
+                "client_name": client_name,
+                # $push order is not stable between aggregations
+                "bill_ids": sorted(bill_ids),
+                "numbers": numbers
+            }
+            if existing.pop(cid, None) == entry:
+                continue
+            ops.append(UpdateOne(
+                {"instance_full_id": self.instance_full_id, "client_id": cid},
+                {"$set": {**entry, "updated_at": refreshed_at}},
+                upsert=True
+            ))
+
+        if ops:
+            self.db.dialer_priority.bulk_write(ops, ordered=False)
+        # Whatever is left in `existing` has no eligible bills anymore
+        removed = 0
+        if existing:
+            removed = self.db.dialer_priority.delete_many({
+                "instance_full_id": self.instance_full_id,
+                "client_id": {"$in": list(existing)}
+            }).deleted_count
+
+        self.db.data_reference.update_one(
+            {"instance_full_id": self.instance_full_id},
+            {"$set": {
+                "instance_full_id": self.instance_full_id,
+                "dialer_priority": {
+                    "clients": len(candidates), "bills": bill_count, "changed": len(ops),
+                    "removed": removed, "refreshed_at": refreshed_at
+                }
+            }},
+            upsert=True
+        )
+        logger.info(f"Priority index for {self.instance_full_id}: {len(candidates)} clients ({len(ops)} changed, {removed} removed)")
+        return len(candidates)
+
+    def summary(self):
+        """Returns {"clients", "bills", "refreshed_at"} of the last refresh, or None if never built."""
+        doc = self.db.data_reference.find_one({"instance_full_id": self.instance_full_id}, {"dialer_priority": 1})
+        return (doc or {}).get("dialer_priority")
+
+    def iter_ranked(self, batch_size=100):
+        """Yields entries best score first, as the dialer's candidate tuples."""
+        cursor = self.db.dialer_priority.find(
+            {"instance_full_id": self.instance_full_id},
+            {"_id": 0, "client_id": 1, "max_expired_age": 1, "total_value": 1,
+             "client_name": 1, "bill_ids": 1, "numbers": 1}
+        ).sort("score", -1).batch_size(batch_size)
+        for doc in cursor:
+            yield (doc["client_id"], doc["max_expired_age"], doc["total_value"],
+                   doc.get("client_name"), doc.get("bill_ids", []), doc.get("numbers", []))
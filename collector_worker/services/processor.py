@@ -1,5 +1,6 @@
 from datetime import datetime
 from loguru import logger
+from utils.phone_utils import build_dial_numbers
 
 class Processor:
     def __init__(self, instance_config):
@@ -63,7 +64,7 @@ class Processor:
             if not self.validate_client(client):
                 continue
             
-            processed.append({
+            processed_client = {
                 "id": self._to_int(client.get('id')),
                 "razao": client.get('razao'),
                 "fantasia": client.get('fantasia'),
@@ -84,7 +85,9 @@ class Processor:
                 "tipo_pessoa": self._get_tipo_pessoa(client),
                 "id_tipo_cliente": self._to_int(client.get('id_tipo_cliente')),
                 "data_ultima_alteracao": datetime.now()
-            })
+            }
+            processed_client["dial_numbers"] = build_dial_numbers(processed_client)
+            processed.append(processed_client)
         return processed
 
     def calculate_days_until_due(self, due_date_obj):
@@ -199,6 +202,8 @@ class Processor:
                 "participa_pre_cobranca": client.get('participa_pre_cobranca', ''),
                 "tipo_pessoa": client.get('tipo_pessoa') or client.get('pessoa') or '',
             })
+            # Normalized once here so the dialer never re-parses the phone fields
+            merged_bill['dial_numbers'] = client.get('dial_numbers') or build_dial_numbers(merged_bill)
             
             # Unique ID
             merged_bill['full_id'] = f"{self.instance_pre_id}-{client_id}-{bill['id']}"
@@ -1,11 +1,23 @@
 import requests
-import re
-import json
-import html
-from datetime import datetime
+import queue
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
 from loguru import logger
 from database import Database
 from utils.time_utils import is_within_operational_window
+from utils.instance_utils import get_instance_full_id
+from services.outbound_governor import OutboundGovernor, host_key
+from services.pbx_sessions import PbxSessionCache
+from services.call_outcomes import CallOutcomeService
+from config import Config
+from utils.cdr_stream import CdrStreamParser, iter_cdr_rows
+from utils.html_cells import clean_row, parse_table
+from utils.cdr_csv import MASTER_CSV_BASE_FIELDS, MASTER_CSV_OPTIONAL_FIELDS, read_appended
+from utils.event_codec import encode_events
+
+class SessionExpired(Exception):
+    """The PBX answered with its login page: the session cookie is no longer valid."""
 
 class ReportService:
 
@@ -33,6 +45,16 @@ class ReportService:
         "userfield"
     ]
 
+    CALLDATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+    # Row limit sent with the report form; a result this long may be truncated
+    CDR_FETCH_LIMIT = 100000
+    # Rows behind the watermark looked up per query (see unstored_cdrs)
+    LATE_CHECK_BATCH = 1000
+
+    # Present on the Issabel login form, absent from authenticated pages
+    LOGIN_MARKER = 'name="input_user"'
+
     EVENT_FIELDS = [
         "eventtime", "eventtype", "cid_name", "cid_num", 
         "cid_dnid", "exten", "appname", "uniqueid"
@@ -47,10 +69,19 @@ class ReportService:
         self.username = asterisk_config.get('cdr_username')
         self.password = asterisk_config.get('cdr_password')
         
-        if not all([host, self.username, self.password]):
+        # CDR source: "web" scrapes the Issabel report, "csv" tails the PBX's cdr-csv file
+        self.cdr_source = asterisk_config.get('cdr_source', 'web')
+        self.cdr_csv_path = asterisk_config.get('cdr_csv_path', Config.CDR_CSV_PATH)
+        # Optional trailing columns the PBX writes (loguniqueid / loguserfield in cdr.conf)
+        self.cdr_csv_fields = MASTER_CSV_BASE_FIELDS + asterisk_config.get('cdr_csv_extra_fields', MASTER_CSV_OPTIONAL_FIELDS)
+        self._csv_position = None
+
+        if self.cdr_source != 'csv' and not all([host, self.username, self.password]):
             logger.warning(f"Missing CDR configuration for instance {instance.get('instance_name')}. Check cdr_host, cdr_username, cdr_password.")
             
         self.base_url = f"http://{host}:{port}".rstrip('/')
+        self.host = host_key(host, port)
+        self.instance_full_id = get_instance_full_id(instance)
         
         # Determine channel pattern (field_pattern)
         # Requirement: "field_pattern is in instannce_document.asterisk.channel"
@@ -60,186 +91,540 @@ class ReportService:
         self.login_url = f"{self.base_url}/index.php"
         self.cdr_url = f"{self.base_url}/index.php?menu=cdrreport"
         
-        self.session = requests.Session()
-        self.session.headers.update({
+        # Filled by process(): fetched/new counts and the resulting watermark
+        self.last_stats = {}
+        
+        self.session = self._new_session()
+        # issabelSession cookies are shared per CDR host/user (services/pbx_sessions.py)
+        self.session_key = PbxSessionCache.key(self.host, self.username)
+        self.session_reused = False
+        
+        # Optional per-call event enrichment (one raw-mode page per uniqueid)
+        self.fetch_events_enabled = asterisk_config.get('fetch_events', Config.CDR_EVENTS_ENABLED)
+        self.events_workers = max(int(asterisk_config.get('events_workers', Config.CDR_EVENTS_WORKERS)), 1)
+
+    def _new_session(self):
+        session = requests.Session()
+        session.headers.update({
             "User-Agent": "Mozilla/5.0",
             "Content-Type": "application/x-www-form-urlencoded",
             "Accept": "text/html"
         })
+        return session
 
-    def clean_html(self, text):
-        if not text:
-            return None
-        text = str(text) # Ensure string
-        # Remove all HTML tags
-        text = re.sub(r'<[^>]+>', '', text)
-        # Convert HTML entities
-        text = html.unescape(text)
-        text = text.strip()
-        if text in ("", "&nbsp;"):
-            return None
-        return text
-
-    def login(self):
+    def login(self, session=None):
+        session = session or self.session
         payload = {
             "input_user": self.username,
             "input_pass": self.password,
             "submit_login": ""
         }
         try:
-            r = self.session.post(self.login_url, data=payload, allow_redirects=True, timeout=30)
-            if not any(c.name == "issabelSession" for c in self.session.cookies):
+            with OutboundGovernor().slot(self.host, self.instance_full_id):
+                r = session.post(self.login_url, data=payload, allow_redirects=True, timeout=30)
+            if not any(c.name == "issabelSession" for c in session.cookies):
                 raise Exception("Session cookie not found after login")
             logger.info(f"Logged in to Asterisk/Issabel at {self.base_url}")
         except Exception as e:
             logger.error(f"Login failed: {e}")
             raise
+        if session is self.session:
+            PbxSessionCache().put(self.session_key, [
+                {"name": c.name, "value": c.value, "domain": c.domain, "path": c.path} for c in session.cookies
+            ])
+
+    def ensure_session(self):
+        """
+        Loads the cached session cookies for this CDR host, or logs in when
+        there are none. A reused session is only checked by the first real
+        request (see SessionExpired), so a live one costs no round trip.
+        """
+        cookies = PbxSessionCache().get(self.session_key)
+        if not cookies:
+            self.session_reused = False
+            self.login()
+            return
+        for c in cookies:
+            self.session.cookies.set(c["name"], c["value"], domain=c.get("domain") or "", path=c.get("path") or "/")
+        self.session_reused = True
+        logger.debug(f"Reusing Issabel session for {self.host}")
+
+    @classmethod
+    def is_login_page(cls, text):
+        return bool(text) and cls.LOGIN_MARKER in text
+
+    @classmethod
+    def parse_calldate(cls, value):
+        try:
+            return datetime.strptime(value, cls.CALLDATE_FORMAT)
+        except (TypeError, ValueError):
+            return None
+
+    def load_watermark(self):
+        """Returns (calldate, uniqueid) of the newest CDR already ingested for this instance."""
+        doc = Database().get_db().data_reference.find_one(
+            {"instance_full_id": self.instance_full_id}, {"cdr_watermark": 1}
+        ) or {}
+        mark = doc.get("cdr_watermark") or {}
+        return self.parse_calldate(mark.get("calldate")), mark.get("uniqueid")
+
+    def save_watermark(self, calldate, uniqueid):
+        Database().get_db().data_reference.update_one(
+            {"instance_full_id": self.instance_full_id},
+            {"$set": {
+                "instance_full_id": self.instance_full_id,
+                "cdr_watermark": {
+                    "calldate": calldate.strftime(self.CALLDATE_FORMAT),
+                    "uniqueid": uniqueid,
+                    "updated_at": datetime.now()
+                }
+            }},
+            upsert=True
+        )
+
+    @classmethod
+    def cdr_fingerprint(cls, cdr):
+        """CRC32 of the stored CDR fields; a re-fetched CDR with the same fingerprint is not written again."""
+        return zlib.crc32("\x1f".join(str(cdr.get(f)) for f in cls.CDR_FIELDS_INDEX if f != "src").encode())
+
+    def save_run_summary(self, fetched, written, unchanged):
+        """Records this run in data_reference.cdr_last_run (instead of touching every CDR)."""
+        Database().get_db().data_reference.update_one(
+            {"instance_full_id": self.instance_full_id},
+            {"$set": {
+                "instance_full_id": self.instance_full_id,
+                "cdr_last_run": {
+                    "last_run_timestamp": datetime.now(),
+                    "source": self.cdr_source,
+                    "fetched": fetched,
+                    "written": written,
+                    "unchanged": unchanged
+                }
+            }},
+            upsert=True
+        )
+
+    def load_csv_position(self):
+        """Byte offset/inode reached in the CDR CSV file by the previous run (None = never read)."""
+        doc = Database().get_db().data_reference.find_one(
+            {"instance_full_id": self.instance_full_id}, {"cdr_csv": 1}
+        ) or {}
+        mark = doc.get("cdr_csv") or {}
+        return mark if mark.get("path") == self.cdr_csv_path else None
+
+    def save_csv_position(self, position):
+        Database().get_db().data_reference.update_one(
+            {"instance_full_id": self.instance_full_id},
+            {"$set": {
+                "instance_full_id": self.instance_full_id,
+                "cdr_csv": {
+                    "path": self.cdr_csv_path,
+                    "offset": position["offset"],
+                    "inode": position["inode"],
+                    "updated_at": datetime.now()
+                }
+            }},
+            upsert=True
+        )
 
-    def fetch_cdr_list(self):
+    def fetch_csv_cdrs(self, position=None):
+        """
+        CDRs appended to the cdr-csv file since `position`, in the same shape
+        as the web report (calldate = start, same channel pattern filter).
+        The new position is kept in `_csv_position` until the run is stored.
+        """
+        if "uniqueid" not in self.cdr_csv_fields:
+            logger.warning(f"{self.cdr_csv_path} has no uniqueid column (loguniqueid=yes in cdr.conf); rows cannot be stored")
+            return []
+
+        records, self._csv_position = read_appended(
+            self.cdr_csv_path, position, self.cdr_csv_fields,
+            day=None if position else datetime.now().strftime("%Y-%m-%d")
+        )
+        if self._csv_position["rotated"]:
+            logger.info(f"{self.cdr_csv_path} was rotated, reading it from the start")
+        if self._csv_position["skipped"]:
+            logger.warning(
+                f"Skipped {self._csv_position['skipped']} rows of {self.cdr_csv_path} without "
+                f"{len(self.cdr_csv_fields)} columns; check asterisk.cdr_csv_extra_fields against cdr.conf"
+            )
+
+        cdrs = []
+        for record in records:
+            if self.channel_pattern not in (record.get("channel") or ""):
+                continue
+            cdrs.append(self.row_to_cdr([record.get("start") if f == "calldate" else record.get(f) for f in self.CDR_FIELDS]))
+        return cdrs
+
+    def _commit_csv_position(self):
+        if self._csv_position:
+            self.save_csv_position(self._csv_position)
+            self.last_stats["csv_offset"] = self._csv_position["offset"]
+            self._csv_position = None
+
+    def fetch_window_start(self):
+        """
+        Start of the CDR window to ingest: the watermark minus CDR_OVERLAP_MINUTES
+        (late records), never before CDR_MAX_LOOKBACK_DAYS ago; None = today only.
+        """
+        calldate, _ = self.load_watermark()
+        if calldate is None:
+            return None
+        earliest = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=Config.CDR_MAX_LOOKBACK_DAYS)
+        return max(calldate - timedelta(minutes=Config.CDR_OVERLAP_MINUTES), earliest)
+
+    def unstored_cdrs(self, cdrs):
+        """
+        The CDRs of `cdrs` not stored in last_reports yet. calldate is the call
+        start but the CDR appears at hangup, so a call longer than the overlap
+        shows up behind the watermark. The dialer's trigger doc shares the
+        uniqueid, so only documents with a `cdr_fp` count as stored.
+        """
+        if not cdrs:
+            return []
+        stored = {
+            d["uniqueid"]
+            for d in Database().get_db().last_reports.find(
+                {"uniqueid": {"$in": [c["uniqueid"] for c in cdrs]}, "cdr_fp": {"$exists": True}},
+                {"_id": 0, "uniqueid": 1}
+            )
+        }
+        return [c for c in cdrs if c["uniqueid"] not in stored]
+
+    def request_start(self, since):
+        """
+        Day to request from Issabel for a window starting at `since`. The last
+        successful run (data_reference.cdr_last_run) already read everything
+        up to its own time, so the request only reaches back a day when that
+        run was before midnight (minus CDR_OVERLAP_MINUTES), not whenever the
+        newest call was. `since` still cuts the rows in process().
+        """
+        if since is None:
+            return None
+        doc = Database().get_db().data_reference.find_one(
+            {"instance_full_id": self.instance_full_id}, {"cdr_last_run.last_run_timestamp": 1}
+        ) or {}
+        last_run = (doc.get("cdr_last_run") or {}).get("last_run_timestamp")
+        if not isinstance(last_run, datetime):
+            return since
+        return max(since, last_run - timedelta(minutes=Config.CDR_OVERLAP_MINUTES))
+
+    def row_to_cdr(self, row):
+        cdr = dict(zip(self.CDR_FIELDS, clean_row(row[:len(self.CDR_FIELDS)], len(self.CDR_FIELDS))))
+        
+        # New Logic: userfield == AMD_MACHINE -> disposition = NO ANSWER
+        if cdr.get("userfield") == "AMD_MACHINE":
+            cdr["disposition"] = "NO ANSWER MACHINE"
+
+        cdr = {k: v for k, v in cdr.items() if k in self.CDR_FIELDS_INDEX}
+        cdr["full_id"] = cdr.pop("src") if "src" in cdr else cdr.get("full_id")
+        return cdr
+
+    def iter_cdr_list(self, since=None, pattern=None):
+        """
+        Yields CDR dicts while the report page downloads: the `var cdrs` array
+        is decoded row by row from the streamed response (utils/cdr_stream.py)
+        instead of loading the whole page and regex-matching it. `pattern`
+        overrides the channel filter ("" = every channel).
+        """
         # Requirement: date_* must be today date
+        # The Issabel filter is day-granular: `since` moves date_start back (e.g. to
+        # yesterday for late records); the time cut is applied by process()
         today_str = datetime.now().strftime("%d %b %Y") # e.g., "10 Dec 2025"
+        start_str = since.strftime("%d %b %Y") if since else today_str
         
         payload = {
-            "date_start": today_str,
+            "date_start": start_str,
             "date_end": today_str,
             "field_name": "channel",
-            "field_pattern": self.channel_pattern,
+            "field_pattern": self.channel_pattern if pattern is None else pattern,
             "status": "ALL",
-            "limit": "100000",
+            "limit": str(self.CDR_FETCH_LIMIT),
             "ringgroup": "",
             "timeInSecs": "on",
             "filter": "Filter"
         }
                 
         try:
-            r = self.session.post(self.cdr_url, data=payload, timeout=60)
-            if r.status_code != 200:
-                raise Exception(f"Failed to fetch CDR list. HTTP {r.status_code}")
+            # The slot is held until the body is fully read
+            with OutboundGovernor().slot(self.host, self.instance_full_id):
+                with self.session.post(self.cdr_url, data=payload, timeout=60, stream=True) as r:
+                    if r.status_code != 200:
+                        raise Exception(f"Failed to fetch CDR list. HTTP {r.status_code}")
 
-            match = re.search(r"var cdrs\s*=\s*(\[\[.*?\]\]);", r.text, re.S)
-            if not match:
+                    parser = CdrStreamParser()
+                    for row in iter_cdr_rows(r, parser):
+                        yield self.row_to_cdr(row)
+
+            if not parser.found and self.is_login_page(parser.head):
+                raise SessionExpired(f"Issabel session for {self.host} is no longer valid")
+            if not parser.found:
                 # If no CDRs found, sometimes the array is just empty or not present?
                 # The page structure changes when no results are found.
                 # Since we verified login success, we assume this means no data.
                 logger.warning("CDR JS array not found. Assuming no records for today.")
-                return []
-
-            rows = json.loads(match.group(1))
-            logger.debug(f"Fetched CDRs: {rows}")
-            cdrs = []
-            for row in rows:
-                cdr = {field: self.clean_html(row[i]) if i < len(row) else None for i, field in enumerate(self.CDR_FIELDS)}
-                
-                # New Logic: userfield == AMD_MACHINE -> disposition = NO ANSWER
-                if cdr.get("userfield") == "AMD_MACHINE":
-                    cdr["disposition"] = "NO ANSWER MACHINE"
-
-                cdr = {k: v for k, v in cdr.items() if k in self.CDR_FIELDS_INDEX}
-                cdr["full_id"] = cdr.pop("src") if "src" in cdr else cdr.get("full_id")
-                cdrs.append(cdr)
-            
-            return cdrs
             
+        except SessionExpired:
+            raise
         except Exception as e:
             logger.error(f"Error fetching CDR list: {e}")
             raise
 
-    def fetch_events(self, uniqueid):
+    def fetch_cdr_list(self, since=None):
+        return list(self.iter_cdr_list(since))
+
+    def iter_cdrs(self, since=None, pattern=None):
+        """
+        iter_cdr_list on the current session; when a reused session turns out
+        to be expired (no rows were yielded yet) it is dropped from the cache,
+        a fresh login is made and the fetch runs once more.
+        """
+        try:
+            yield from self.iter_cdr_list(since, pattern)
+        except SessionExpired:
+            if not self.session_reused:
+                raise
+            logger.info(f"Cached Issabel session for {self.host} expired, logging in again")
+            PbxSessionCache().invalidate(self.session_key)
+            self.session.cookies.clear()
+            self.session_reused = False
+            self.login()
+            yield from self.iter_cdr_list(since, pattern)
+        PbxSessionCache().touch(self.session_key)
+
+    def _fetch_events(self, uniqueid, session):
+        """Raw-mode event rows of one call; raises on transport errors so callers can retry later."""
+        url = f"{self.cdr_url}&rawmode=yes&uniqueid={uniqueid}"
+        with OutboundGovernor().slot(self.host, self.instance_full_id):
+            r = session.get(url, timeout=30)
+        if r.status_code != 200:
+            raise Exception(f"HTTP {r.status_code}")
+
+        rows = parse_table(r.text, "issabel-standard-table")
+        if not rows and self.is_login_page(r.text):
+            raise SessionExpired(f"Issabel session for {self.host} is no longer valid")
+        # Note: If cells count differs from EVENT_FIELDS, zip truncates.
+        return [dict(zip(self.EVENT_FIELDS, cells)) for cells in rows]
+
+    def fetch_events(self, uniqueid, session=None):
         if not uniqueid:
             return []
             
-        url = f"{self.cdr_url}&rawmode=yes&uniqueid={uniqueid}"
         try:
-            r = self.session.get(url, timeout=30)
-            if r.status_code != 200:
-                return []
+            return self._fetch_events(uniqueid, session or self.session)
+        except Exception as e:
+            logger.warning(f"Error fetching events for uniqueid {uniqueid}: {e}")
+            return []
 
-            table_match = re.search(r'<table[^>]*class="issabel-standard-table"[^>]*>(.*?)</table>', r.text, re.S)
-            if not table_match:
-                return []
+    def enrich_events(self, cdrs):
+        """
+        Adds `events` to the CDRs whose events were never fetched, using up to
+        `events_workers` threads, each with its own authenticated session.
+        A CDR is final once written, so a uniqueid flagged `events_fetched`
+        in last_reports is never fetched again; failed fetches stay unflagged
+        and are retried by a later run.
+        """
+        uniqueids = [c["uniqueid"] for c in cdrs if c.get("uniqueid")]
+        if not uniqueids:
+            return 0
 
-            table_html = table_match.group(1)
-            rows = re.findall(r'<tr[^>]*>(.*?)</tr>', table_html, re.S)
-            events = []
+        db = Database().get_db()
+        done = {d["uniqueid"] for d in db.last_reports.find(
+            {"uniqueid": {"$in": uniqueids}, "events_fetched": True}, {"_id": 0, "uniqueid": 1}
+        )}
+        pending = [c for c in cdrs if c.get("uniqueid") and c["uniqueid"] not in done]
+        if not pending:
+            return 0
 
-            for row in rows[1:]:  # skip header
-                cells = re.findall(r'<td[^>]*>(.*?)</td>', row, re.S)
-                clean_cells = [self.clean_html(c) for c in cells]
-                
-                # Basic check to avoid empty rows
-                if any(clean_cells): 
-                    # Zip with expected fields
-                    # Note: If cells count differs from EVENT_FIELDS, zip truncates. 
-                    events.append(dict(zip(self.EVENT_FIELDS, clean_cells)))
+        # Session pool: the main session is already logged in, the others log in on first use
+        sessions = queue.Queue()
+        sessions.put(self.session)
+        for _ in range(min(self.events_workers, len(pending)) - 1):
+            sessions.put(None)
 
-            return events
-        except Exception as e:
-            logger.warning(f"Error fetching events for uniqueid {uniqueid}: {e}")
-            return []
+        def _enrich(cdr):
+            session = sessions.get()
+            try:
+                if session is None:
+                    session = self._new_session()
+                    self.login(session)
+                events = self._fetch_events(cdr["uniqueid"], session)
+                cdr["events"] = encode_events(events) if Config.CDR_EVENTS_COMPACT else events
+                cdr["events_fetched"] = True
+                return True
+            except Exception as e:
+                logger.warning(f"Error fetching events for uniqueid {cdr['uniqueid']}: {e}")
+                return False
+            finally:
+                sessions.put(session)
+
+        workers = min(self.events_workers, len(pending))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="cdr-events") as pool:
+            enriched = sum(pool.map(_enrich, pending))
+
+        logger.info(f"Fetched events for {enriched}/{len(pending)} calls ({len(done)} already stored)")
+        return enriched
+
+    def shared_fetch_key(self):
+        """Instances with the same key read the same Issabel report (None = not shareable, e.g. CSV source)."""
+        if self.cdr_source == 'csv':
+            return None
+        return (self.host, self.username)
+
+    @classmethod
+    def fetch_shared(cls, services):
+        """
+        Downloads the CDRs of several instances on the same CDR host once:
+        no channel filter, from the earliest window start among them. Each
+        instance then takes its own rows with route_cdrs().
+        """
+        today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        since = min(s.request_start(s.fetch_window_start()) or today for s in services)
+        lead = services[0]
+        lead.ensure_session()
+        cdrs = list(lead.iter_cdrs(since, pattern=""))
+        if len(cdrs) >= cls.CDR_FETCH_LIMIT:
+            # Issabel cuts the list silently; the channel-filtered fetches are smaller
+            raise Exception(f"{len(cdrs)} rows reached the report limit of {cls.CDR_FETCH_LIMIT}")
+        logger.info(f"Fetched {len(cdrs)} CDR records from {lead.host} for {len(services)} instances")
+        return cdrs
+
+    def route_cdrs(self, shared_cdrs):
+        """Copies of the shared CDRs whose channel matches this instance's pattern (same rule as the Issabel filter)."""
+        return [dict(c) for c in shared_cdrs if self.channel_pattern in (c.get("channel") or "")]
 
     def check_window(self):
         """Returns True if current time is within allowed call window (same as Dialer)"""
         # Check instance debug flag (mirrored from Dialer logic, though 'debug_calls' is specific)
         return is_within_operational_window(self.instance.get('debug_calls', False))
 
-    def process(self):
+    def process(self, shared_cdrs=None):
         """
         Orchestrates the entire report fetching process and saves to DB.
+        `shared_cdrs` are rows already downloaded for this CDR host
+        (see fetch_shared); this instance's rows are routed from them.
         """
         try:
             if not self.check_window():
                 logger.info(f"Skipping report fetch for {self.instance.get('instance_name')} (Outside Window)")
                 return
 
-            self.login()
-            cdrs = self.fetch_cdr_list()
-            logger.info(f"Fetched {len(cdrs)} CDR records")
+            if shared_cdrs is not None:
+                # The shared download started at the earliest window of the group
+                since = self.fetch_window_start() or datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+                source = self.route_cdrs(shared_cdrs)
+            elif self.cdr_source == 'csv':
+                # Only the bytes appended since the last run are read; the
+                # first run keeps today's rows, like the web report
+                position = self.load_csv_position()
+                since = None if position else datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+                source = self.fetch_csv_cdrs(position)
+            else:
+                self.ensure_session()
+                since = self.fetch_window_start()
+                source = self.iter_cdrs(self.request_start(since))
+            
+            # Rows are filtered as they stream in: the delta since the watermark
+            # (minus overlap) is kept, older rows only while not stored yet
+            fetched = 0
+            late = 0
+            cdrs = []
+            older = []
+            for cdr in source:
+                fetched += 1
+                if since is None or (self.parse_calldate(cdr.get("calldate")) or since) >= since:
+                    cdrs.append(cdr)
+                elif cdr.get("uniqueid"):
+                    older.append(cdr)
+                    if len(older) >= self.LATE_CHECK_BATCH:
+                        found = self.unstored_cdrs(older)
+                        late += len(found)
+                        cdrs.extend(found)
+                        older = []
+            found = self.unstored_cdrs(older)
+            late += len(found)
+            cdrs.extend(found)
+            if shared_cdrs is None and self.cdr_source != 'csv' and fetched >= self.CDR_FETCH_LIMIT:
+                logger.warning(f"Fetched {fetched} CDRs, the report limit: rows since {since or 'start of day'} may be missing")
+            self.last_stats = {"fetched": fetched, "new": len(cdrs), "late": late, "since": since, "source": self.cdr_source, "shared": shared_cdrs is not None}
+            logger.info(f"Fetched {fetched} CDR records, {len(cdrs)} since {since or 'start of day'} ({late} older, not stored yet)")
             logger.debug(f"Fetched CDRs: {cdrs}")
             if not cdrs:
-                return
+                self.save_run_summary(fetched, 0, 0)
+                self._commit_csv_position()
+                return fetched
 
             # Enrich with events
-            # This might be slow for 1000s of records. try.py did it sequentially.
-            # We will keep it sequential for now as per try.py logic.
-            # for cdr in cdrs:
-            #     uid = cdr.get("uniqueid")
-            #     cdr["events"] = self.fetch_events(uid) if uid else []
+            # One raw-mode page per uniqueid, so it runs concurrently over a session pool
+            # and skips calls whose events are already stored (see enrich_events)
+            if self.fetch_events_enabled and self.cdr_source != 'csv':
+                if shared_cdrs is not None:
+                    self.ensure_session()
+                self.enrich_events(cdrs)
 
             # Insert into 'last_reports' collection
             # Requirement: Upsert individual CDRs using uniqueid as key
             
             db = Database().get_db()
             
-            name = self.instance.get('instance_name', 'default')
-            erp_type = self.instance.get('erp', {}).get('type', 'ixc')
-            oid = str(self.instance.get('_id', ''))
-            instance_full_id = f"{name}-{erp_type}-{oid}"
+            instance_full_id = self.instance_full_id
             
             from pymongo import UpdateOne
             ops = []
+            uniqueids = [cdr["uniqueid"] for cdr in cdrs if cdr.get("uniqueid")]
+            
+            # Only new CDRs and CDRs whose fields changed since they were stored are written
+            known = {
+                d["uniqueid"]: d.get("cdr_fp")
+                for d in db.last_reports.find({"uniqueid": {"$in": uniqueids}}, {"_id": 0, "uniqueid": 1, "cdr_fp": 1})
+            }
+            unchanged = 0
+            now = datetime.now()
             
             for cdr in cdrs:
+                # Check for uniqueid to be safe
+                if not cdr.get('uniqueid'):
+                    continue
+                
+                cdr['cdr_fp'] = self.cdr_fingerprint(cdr)
+                if known.get(cdr['uniqueid']) == cdr['cdr_fp'] and not cdr.get('events_fetched'):
+                    unchanged += 1
+                    continue
+                
                 # Enrich with instance metadata
                 cdr['instance_full_id'] = instance_full_id
-                cdr['last_run_timestamp'] = datetime.now()
-                cdr['date_collected'] = datetime.now().strftime("%Y-%m-%d")
-                
-                # Check for uniqueid to be safe
-                if cdr.get('uniqueid'):
-                    ops.append(
-                        UpdateOne(
-                            {"uniqueid": cdr["uniqueid"]},
-                            {"$set": cdr},
-                            upsert=True
-                        )
+                cdr['last_run_timestamp'] = now
+                cdr['date_collected'] = now.strftime("%Y-%m-%d")
+                ops.append(
+                    UpdateOne(
+                        {"uniqueid": cdr["uniqueid"]},
+                        {"$set": cdr},
+                        upsert=True
                     )
+                )
             
             if ops:
-                res = db.last_reports.bulk_write(ops)
-                logger.info(f"Upserted {len(ops)} CDRs to 'last_reports' collection")
+                db.last_reports.bulk_write(ops, ordered=False)
+            logger.info(f"Upserted {len(ops)} CDRs to 'last_reports' collection ({unchanged} unchanged)")
+            self.last_stats.update({"written": len(ops), "unchanged": unchanged})
+            self.save_run_summary(fetched, len(ops), unchanged)
+            
+            # Join stage: final disposition onto the dialed bills and dial_state
+            # (every uniqueid, so a join interrupted by a failed run is completed)
+            if uniqueids:
+                CallOutcomeService(instance_full_id).apply(uniqueids)
             
-            return len(cdrs)
+            # Advance the watermark to the newest CDR written
+            dated = [(self.parse_calldate(c.get("calldate")), c.get("uniqueid")) for c in cdrs]
+            dated = [d for d in dated if d[0]]
+            if dated:
+                newest = max(dated, key=lambda d: d[0])
+                self.save_watermark(*newest)
+                self.last_stats["watermark"] = newest[0].strftime(self.CALLDATE_FORMAT)
+            self._commit_csv_position()
+            
+            return fetched
 
         except Exception as e:
             logger.error(f"Report Service process failed: {e}")
-            return 0
+            raise
@@ -0,0 +1,121 @@
+import csv
+import os
+
+# Column order of Asterisk's cdr_csv backend (Master.csv)
+MASTER_CSV_BASE_FIELDS = [
+    "accountcode", "src", "dst", "dcontext", "clid", "channel", "dstchannel",
+    "lastapp", "lastdata", "start", "answer", "end", "duration", "billsec",
+    "disposition", "amaflags"
+]
+# Appended only with loguniqueid / loguserfield in cdr.conf, in this order
+MASTER_CSV_OPTIONAL_FIELDS = ["uniqueid", "userfield"]
+MASTER_CSV_FIELDS = MASTER_CSV_BASE_FIELDS + MASTER_CSV_OPTIONAL_FIELDS
+
+# Bytes of the current file read per call; a larger backlog is consumed by the next runs
+MAX_READ_BYTES = 32 * 1024 * 1024
+
+_END_COLUMN = MASTER_CSV_BASE_FIELDS.index("end")
+
+def _parse(lines):
+    return next(csv.reader(lines), None)
+
+def _records(f, limit=None):
+    """
+    Yields (row, offset after it) for the complete CSV records from the
+    current position of binary file `f`, one line at a time. A record goes
+    on while its quote count is odd (newline inside a quoted field); a
+    half-written last line ends the read.
+    """
+    lines = []
+    quotes = 0
+    read = 0
+    while limit is None or read < limit:
+        line = f.readline()
+        if not line.endswith(b"\n"):
+            break
+        read += len(line)
+        lines.append(line.decode("utf-8", errors="replace"))
+        quotes += line.count(b'"')
+        if quotes % 2:
+            continue
+        row = _parse(lines)
+        lines, quotes = [], 0
+        yield row, f.tell()
+
+def _day_offset(f, size, day):
+    """
+    Offset of the first line that ended on `day` ('YYYY-MM-DD') or later.
+    Asterisk appends records when calls end, so the file is ordered by
+    `end` and can be bisected; unparsable lines count as "later", which
+    only makes the read start earlier.
+    """
+    lo, hi = 0, size
+    while hi - lo > 4096:
+        mid = (lo + hi) // 2
+        f.seek(mid)
+        f.readline()
+        row = _parse([f.readline().decode("utf-8", errors="replace")])
+        if row and len(row) > _END_COLUMN and row[_END_COLUMN][:10] < day:
+            lo = mid
+        else:
+            hi = mid
+    f.seek(lo)
+    if lo:
+        f.readline()
+    return f.tell()
+
+def _read_from(path, offset, fields, limit=None, day=None):
+    """
+    Records of `path` after byte `offset` (or from the first line of `day`
+    when given); returns (records, offset after the last complete record,
+    rows skipped for a column count other than len(fields)).
+    """
+    records = []
+    skipped = 0
+    with open(path, "rb") as f:
+        if day is not None:
+            offset = _day_offset(f, os.fstat(f.fileno()).st_size, day)
+        f.seek(offset)
+        for row, offset_after in _records(f, limit):
+            offset = offset_after
+            if not row:
+                continue
+            if len(row) != len(fields):
+                skipped += 1
+                continue
+            records.append(dict(zip(fields, row)))
+    return records, offset, skipped
+
+def read_appended(path, position=None, fields=None, day=None):
+    """
+    Reads the records appended to a CDR CSV file since `position`
+    ({"offset", "inode"} from a previous call). Without a position the read
+    starts at the first record that ended on `day` ('YYYY-MM-DD'), or at the
+    start of the file when `day` is None.
+
+    Rotation is detected by a changed inode or a file shorter than the
+    offset; the file then is read from the start, after the remainder of the
+    rotated file when it is still at `<path>.1`. At most MAX_READ_BYTES of
+    the current file are read per call. Returns (records, position), records
+    being dicts keyed by `fields` (default MASTER_CSV_FIELDS); rows with
+    another column count are counted in position["skipped"].
+    """
+    fields = fields or MASTER_CSV_FIELDS
+    stat = os.stat(path)
+    offset = (position or {}).get("offset", 0)
+    inode = (position or {}).get("inode")
+    records = []
+    skipped = 0
+    rotated = inode is not None and (inode != stat.st_ino or stat.st_size < offset)
+
+    if rotated:
+        previous = f"{path}.1"
+        if inode != stat.st_ino and os.path.exists(previous) and os.stat(previous).st_ino == inode:
+            records, _, skipped = _read_from(previous, offset, fields)
+        offset = 0
+
+    first_day = day if position is None else None
+    appended, offset, skipped_now = _read_from(path, offset, fields, MAX_READ_BYTES, first_day)
+    records.extend(appended)
+    return records, {"offset": offset, "inode": stat.st_ino, "size": stat.st_size,
+                     "rotated": rotated, "skipped": skipped + skipped_now}
@@ -0,0 +1,102 @@
+import codecs
+import json
+
+class CdrStreamParser:
+    """
+    Incremental parser for the `var cdrs = [[...], [...], ...];` array that
+    the Issabel CDR report embeds in its HTML page.
+
+    Feed decoded text chunks as they are downloaded; each call returns the
+    rows completed so far. Text before the array is discarded while scanning
+    and consumed rows are dropped from the buffer, so memory stays bounded by
+    the chunk size plus one row. `found` tells "no array on the page" apart
+    from "empty array"; `done` is set once the closing bracket is read.
+    `head` keeps the start of the page (up to HEAD_CHARS) so a page without
+    the array can still be told apart, e.g. a login form.
+    """
+
+    MARKER = "var cdrs"
+    HEAD_CHARS = 16384
+
+    def __init__(self):
+        self.found = False
+        self.done = False
+        self.head = ""
+        self._buffer = ""
+        self._in_array = False
+        self._decoder = json.JSONDecoder()
+
+    def feed(self, text):
+        if self.done or not text:
+            return []
+        if len(self.head) < self.HEAD_CHARS:
+            self.head += text[:self.HEAD_CHARS - len(self.head)]
+        self._buffer += text
+        return self._parse()
+
+    def _find_array_start(self):
+        if not self.found:
+            idx = self._buffer.find(self.MARKER)
+            if idx < 0:
+                # Keep a tail in case the marker is split across chunks
+                self._buffer = self._buffer[-len(self.MARKER):]
+                return False
+            self.found = True
+            self._buffer = self._buffer[idx + len(self.MARKER):]
+
+        idx = self._buffer.find("[")
+        if idx < 0:
+            return False
+        self._buffer = self._buffer[idx + 1:]
+        self._in_array = True
+        return True
+
+    def _parse(self):
+        rows = []
+        if not self._in_array and not self._find_array_start():
+            return rows
+
+        buf = self._buffer
+        pos = 0
+        length = len(buf)
+        while pos < length:
+            ch = buf[pos]
+            if ch in " \t\r\n,":
+                pos += 1
+                continue
+            if ch == "]":
+                self.done = True
+                pos += 1
+                break
+            try:
+                row, end = self._decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                # Row not fully downloaded yet; wait for the next chunk
+                break
+            rows.append(row)
+            pos = end
+
+        self._buffer = buf[pos:]
+        return rows
+
+    def close(self):
+        """Call after the last chunk; raises if the array was cut short."""
+        if self.found and self._in_array and not self.done:
+            raise ValueError("CDR array truncated: response ended before the closing bracket")
+
+def iter_cdr_rows(response, parser=None, chunk_size=65536):
+    """
+    Yields the raw `var cdrs` rows of a streamed requests response
+    (`stream=True`) while it downloads. Pass a CdrStreamParser to inspect
+    `parser.found` afterwards (a page without the array yields nothing).
+    """
+    parser = parser or CdrStreamParser()
+    decoder = codecs.getincrementaldecoder(response.encoding or "utf-8")(errors="replace")
+    for chunk in response.iter_content(chunk_size=chunk_size):
+        for row in parser.feed(decoder.decode(chunk)):
+            yield row
+        if parser.done:
+            break
+    for row in parser.feed(decoder.decode(b"", final=True)):
+        yield row
+    parser.close()
@@ -0,0 +1,89 @@
+from datetime import datetime, timedelta
+
+# Interned CEL event types: an event type is stored as its index here.
+# Append only - stored documents refer to these positions (the frontend
+# decoder in collector_frontend/utils.py keeps a copy of this list).
+EVENT_TYPES = [
+    "CHAN_START", "CHAN_END", "ANSWER", "HANGUP", "APP_START", "APP_END",
+    "BRIDGE_ENTER", "BRIDGE_EXIT", "LINKEDID_END", "PARK_START", "PARK_END",
+    "BLINDTRANSFER", "ATTENDEDTRANSFER", "PICKUP", "FORWARD", "LOCAL_OPTIMIZE",
+    "USER_DEFINED", "BRIDGE_START", "BRIDGE_END", "BRIDGE_UPDATE", "TRANSFER", "3WAY_START", "3WAY_END"
+]
+_TYPE_CODES = {name: code for code, name in enumerate(EVENT_TYPES)}
+
+EVENT_FIELDS = ["eventtime", "eventtype", "cid_name", "cid_num", "cid_dnid", "exten", "appname", "uniqueid"]
+_TEXT_FIELDS = ["cid_name", "cid_num", "cid_dnid", "exten", "appname", "uniqueid"]
+
+FORMAT_VERSION = 1
+_EPOCH = datetime(1970, 1, 1)
+
+def _epoch(value):
+    """Whole seconds of a PBX wall-clock 'YYYY-MM-DD HH:MM:SS' (no timezone applied); None if it has another form."""
+    if not isinstance(value, str) or len(value) != 19 or value[10] != " ":
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    # '2025-01-01 10:00+03' is 19 chars too, but carries an offset
+    if parsed.tzinfo is not None:
+        return None
+    return int((parsed - _EPOCH).total_seconds())
+
+def _column(values):
+    """A column whose values are all equal is stored once as a scalar."""
+    first = values[0]
+    return first if all(v == first for v in values) else values
+
+def encode_events(events):
+    """
+    Columnar form of a call's event rows (list of EVENT_FIELDS dicts):
+
+        {"v": 1, "n": 12, "t0": <epoch s>, "dt": [0, 0, 3, ...],
+         "type": [0, 4, 2, ...], "cid_num": "5582...", "appname": [...], ...}
+
+    Timestamps become seconds since the first event, event types their
+    EVENT_TYPES code (unknown types stay strings), and columns with a single
+    repeated value (uniqueid, caller id) a scalar. Times that are not
+    whole-second 'YYYY-MM-DD HH:MM:SS' are kept verbatim in "eventtime".
+    """
+    if not events:
+        return None
+
+    doc = {"v": FORMAT_VERSION, "n": len(events)}
+    times = [_epoch(e.get("eventtime")) for e in events]
+    if all(t is not None for t in times):
+        doc["t0"] = times[0]
+        doc["dt"] = _column([t - times[0] for t in times])
+    else:
+        doc["eventtime"] = [e.get("eventtime") for e in events]
+
+    doc["type"] = _column([_TYPE_CODES.get(e.get("eventtype"), e.get("eventtype")) for e in events])
+    for field in _TEXT_FIELDS:
+        doc[field] = _column([e.get(field) for e in events])
+    return doc
+
+def decode_events(doc):
+    """Event rows (EVENT_FIELDS dicts) of an encoded document; lists of rows (legacy storage) pass through."""
+    if not doc:
+        return []
+    if isinstance(doc, list):
+        return doc
+
+    n = doc["n"]
+
+    def column(value):
+        return value if isinstance(value, list) else [value] * n
+
+    if "t0" in doc:
+        start = _EPOCH + timedelta(seconds=doc["t0"])
+        times = [(start + timedelta(seconds=dt)).isoformat(" ") for dt in column(doc["dt"])]
+    else:
+        times = column(doc.get("eventtime"))
+    types = [EVENT_TYPES[t] if isinstance(t, int) and 0 <= t < len(EVENT_TYPES) else t for t in column(doc.get("type"))]
+    columns = {field: column(doc.get(field)) for field in _TEXT_FIELDS}
+
+    return [
+        {"eventtime": times[i], "eventtype": types[i], **{field: columns[field][i] for field in _TEXT_FIELDS}}
+        for i in range(n)
+    ]
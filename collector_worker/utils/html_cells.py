@@ -0,0 +1,58 @@
+import html
+import re
+
+_TAG = re.compile(r'<[^>]+>')
+_ROW = re.compile(r'<tr[^>]*>(.*?)</tr>', re.S)
+_CELL = re.compile(r'<td[^>]*>(.*?)</td>', re.S)
+_TABLES = {}
+
+def clean_cell(text):
+    """
+    Text of one HTML cell: tags removed, entities decoded, stripped.
+    Returns None for empty cells (including `&nbsp;`). Plain values (no `<`
+    or `&`, e.g. most CDR fields) skip the regex and unescape entirely.
+    """
+    if not text:
+        return None
+    if text.__class__ is not str:
+        text = str(text)
+    if '<' in text:
+        text = _TAG.sub('', text)
+    if '&' in text:
+        text = html.unescape(text)
+    text = text.strip()
+    if text in ("", "&nbsp;"):
+        return None
+    return text
+
+def clean_row(cells, width=None):
+    """Cleans a list of cells; with `width`, pads missing trailing cells with None."""
+    cleaned = [clean_cell(c) for c in cells]
+    if width is not None and len(cleaned) < width:
+        cleaned.extend([None] * (width - len(cleaned)))
+    return cleaned
+
+def _table_pattern(css_class):
+    pattern = _TABLES.get(css_class)
+    if pattern is None:
+        pattern = re.compile(r'<table[^>]*class="' + re.escape(css_class) + r'"[^>]*>(.*?)</table>', re.S)
+        _TABLES[css_class] = pattern
+    return pattern
+
+def parse_table(page, css_class, skip_header=True):
+    """
+    Cleaned cell rows of the first `<table class="css_class">` in `page`
+    (empty rows dropped); [] when the table is missing.
+    """
+    match = _table_pattern(css_class).search(page)
+    if not match:
+        return []
+    rows = _ROW.findall(match.group(1))
+    if skip_header:
+        rows = rows[1:]
+    parsed = []
+    for row in rows:
+        cells = clean_row(_CELL.findall(row))
+        if any(cells):
+            parsed.append(cells)
+    return parsed
@@ -0,0 +1,15 @@
+def get_instance_full_id(instance: dict) -> str:
+    """
+    Returns the instance partition key '<name>-<erp_type>-<_id>'.
+
+    Configs served by the InstanceRegistry carry it precomputed; raw
+    documents (e.g. read straight from 'instance_config') derive it.
+    """
+    precomputed = instance.get('instance_full_id')
+    if precomputed:
+        return precomputed
+
+    name = instance.get('instance_name', 'default')
+    erp_type = instance.get('erp', {}).get('type', 'ixc')
+    oid = str(instance.get('_id', ''))
+    return f"{name}-{erp_type}-{oid}"
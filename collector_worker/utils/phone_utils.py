@@ -0,0 +1,69 @@
+import re
+
+# Client fields holding phone numbers, in dialing preference order
+PHONE_FIELDS = ("telefone_celular", "telefone_comercial", "whatsapp")
+
+BR_COUNTRY_CODE = "55"
+
+_NON_DIGITS = re.compile(r'\D')
+
+def normalize_phone(raw, source=None):
+    """
+    Normalizes a Brazilian phone number.
+
+    Returns {"number", "e164", "valid", "source"} or None when there is
+    nothing dialable (fewer than 8 digits). `number` is the digits-only form
+    the dialer sends to the trunk and keys dial_state with; `e164` is
+    "+55<DDD><subscriber>" when the number has a plausible national format
+    (10 digits, or 11 with a leading 9 for mobiles), otherwise None and
+    `valid` is False.
+    """
+    if not raw:
+        return None
+
+    digits = _NON_DIGITS.sub('', str(raw))
+    if len(digits) < 8:
+        return None
+
+    national = digits.lstrip('0')
+    if national.startswith(BR_COUNTRY_CODE) and len(national) in (12, 13):
+        national = national[2:]
+    elif len(national) in (12, 13) and digits.startswith('0'):
+        # Long-distance carrier code: 0 + XX + DDD + subscriber
+        national = national[2:]
+
+    valid = (
+        len(national) in (10, 11)
+        # Area codes (DDD) are 11-99 and never end in 0 (rules out 0800/0300 service numbers)
+        and national[0] != '0' and national[1] != '0'
+        and (len(national) == 10 or national[2] == '9')
+    )
+    return {
+        "number": digits,
+        "e164": f"+{BR_COUNTRY_CODE}{national}" if valid else None,
+        "valid": valid,
+        "source": source
+    }
+
+def build_dial_numbers(record):
+    """Normalized, deduplicated numbers of a client/bill record (see normalize_phone)."""
+    numbers = []
+    seen = set()
+    for field in PHONE_FIELDS:
+        entry = normalize_phone(record.get(field), source=field)
+        if not entry:
+            continue
+        # The same line typed differently (e.g. with/without 0 or +55) is dialed once
+        key = entry["e164"] or entry["number"]
+        if key in seen:
+            continue
+        seen.add(key)
+        numbers.append(entry)
+    return numbers
+
+def dialable_numbers(record):
+    """Numbers to dial for a record, from its precomputed `dial_numbers` when present."""
+    entries = record.get('dial_numbers')
+    if entries is None:
+        entries = build_dial_numbers(record)
+    return [e["number"] for e in entries]
@@ -0,0 +1,32 @@
+import signal
+import threading
+
+_shutdown = threading.Event()
+
+class ShutdownRequested(BaseException):
+    """
+    Raised at a safe point once SIGTERM/SIGINT was received.
+
+    Derives from BaseException (like KeyboardInterrupt) so the per-instance
+    `except Exception` blocks in the jobs let it through to the main loop.
+    """
+
+def _handle_signal(signum, frame):
+    _shutdown.set()
+
+def install_signal_handlers():
+    """Registers SIGTERM/SIGINT to request a graceful shutdown (call from the main thread)."""
+    signal.signal(signal.SIGTERM, _handle_signal)
+    signal.signal(signal.SIGINT, _handle_signal)
+
+def shutdown_requested() -> bool:
+    return _shutdown.is_set()
+
+def check_shutdown():
+    """Call between units of work (pages, chunks, calls) to stop at a safe point."""
+    if _shutdown.is_set():
+        raise ShutdownRequested()
+
+def wait_for_shutdown(timeout: float) -> bool:
+    """Sleeps up to `timeout` seconds; returns True early if shutdown was requested."""
+    return _shutdown.wait(timeout)